@@ -18,9 +18,15 @@
 
 from struct import pack, Struct
 from decimal import Decimal
-from io import BytesIO
+from functools import lru_cache
 from math import isinf, isnan
-from itertools import accumulate
+from operator import itemgetter
+from sys import getrecursionlimit
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
 from .compat import (
     Mapping,
@@ -66,6 +72,19 @@ __SMALL_UINTS_ENCODED = [
     {i: TYPE_UINT8 + pack(">B", i) for i in range(256)},
     {i: TYPE_UINT8 + pack("<B", i) for i in range(256)},
 ]
+# String marker and length prefix for strings shorter than 256 bytes
+__SMALL_STRING_PREFIXES = [
+    {i: TYPE_STRING + __SMALL_UINTS_ENCODED[0][i] for i in range(256)},
+    {i: TYPE_STRING + __SMALL_UINTS_ENCODED[1][i] for i in range(256)},
+]
+# Container start and count prefix for counted containers with fewer than 256 items
+__SMALL_COUNTED_PREFIXES = {
+    start: [
+        {i: start + CONTAINER_COUNT + __SMALL_UINTS_ENCODED[le][i] for i in range(256)}
+        for le in (0, 1)
+    ]
+    for start in (ARRAY_START, OBJECT_START)
+}
 __PACK_INT16 = [Struct(">h").pack, Struct("<h").pack]
 __PACK_INT32 = [Struct(">i").pack, Struct("<i").pack]
 __PACK_INT64 = [Struct(">q").pack, Struct("<q").pack]
@@ -75,6 +94,16 @@ __PACK_UINT64 = [Struct(">Q").pack, Struct("<Q").pack]
 __PACK_FLOAT16 = [Struct(">h").pack, Struct("<h").pack]
 __PACK_FLOAT32 = [Struct(">f").pack, Struct("<f").pack]
 __PACK_FLOAT64 = [Struct(">d").pack, Struct("<d").pack]
+# Packers emitting the one-byte type marker together with the value, so that
+# a scalar is produced by a single pack and a single write
+__PACK_MARKER_INT16 = [Struct(">ch").pack, Struct("<ch").pack]
+__PACK_MARKER_INT32 = [Struct(">ci").pack, Struct("<ci").pack]
+__PACK_MARKER_INT64 = [Struct(">cq").pack, Struct("<cq").pack]
+__PACK_MARKER_UINT16 = [Struct(">cH").pack, Struct("<cH").pack]
+__PACK_MARKER_UINT32 = [Struct(">cI").pack, Struct("<cI").pack]
+__PACK_MARKER_UINT64 = [Struct(">cQ").pack, Struct("<cQ").pack]
+__PACK_MARKER_FLOAT32 = [Struct(">cf").pack, Struct("<cf").pack]
+__PACK_MARKER_FLOAT64 = [Struct(">cd").pack, Struct("<cd").pack]
 
 __DTYPE_TO_MARKER = {
     "i1": TYPE_INT8,
@@ -109,11 +138,39 @@ __NUMPY_DTYPE_TO_MARKER = {
     "?": TYPE_BOOL_TRUE,  # Boolean
 }
 
+# Narrowest typed-array element type (and struct format character, which numpy also
+# accepts as dtype) covering a given integer range, unsigned types are preferred for
+# non-negative values (as for scalars)
+__TYPED_ARRAY_INT_RANGES = (
+    (0, 2**8 - 1, TYPE_UINT8, "B"),
+    (0, 2**16 - 1, TYPE_UINT16, "H"),
+    (0, 2**32 - 1, TYPE_UINT32, "I"),
+    (0, 2**64 - 1, TYPE_UINT64, "Q"),
+    (-(2**7), 2**7 - 1, TYPE_INT8, "b"),
+    (-(2**15), 2**15 - 1, TYPE_INT16, "h"),
+    (-(2**31), 2**31 - 1, TYPE_INT32, "i"),
+    (-(2**63), 2**63 - 1, TYPE_INT64, "q"),
+)
+# Sequences shorter than this are not worth scanning for typed-array encoding
+__TYPED_ARRAY_MIN_LENGTH = 16
+# Minimum length from which the range of typed-array integer candidates is taken
+# via numpy (if available)
+__TYPED_ARRAY_BULK_MIN_LENGTH = 128
+
 # Prefix applicable to specialised byte array container
 __BYTES_ARRAY_PREFIX = ARRAY_START + CONTAINER_TYPE + TYPE_BYTE + CONTAINER_COUNT
 __BYTES_ARRAY_PREFIX_DRAFT2 = (
     ARRAY_START + CONTAINER_TYPE + TYPE_UINT8 + CONTAINER_COUNT
 )
+# Byte array prefix and length for payloads shorter than 256 bytes
+__SMALL_BYTES_PREFIXES = [
+    {i: __BYTES_ARRAY_PREFIX + __SMALL_UINTS_ENCODED[0][i] for i in range(256)},
+    {i: __BYTES_ARRAY_PREFIX + __SMALL_UINTS_ENCODED[1][i] for i in range(256)},
+]
+__SMALL_BYTES_PREFIXES_DRAFT2 = [
+    {i: __BYTES_ARRAY_PREFIX_DRAFT2 + __SMALL_UINTS_ENCODED[0][i] for i in range(256)},
+    {i: __BYTES_ARRAY_PREFIX_DRAFT2 + __SMALL_UINTS_ENCODED[1][i] for i in range(256)},
+]
 
 
 class EncoderException(TypeError):
@@ -130,89 +187,175 @@ def __encode_decimal(fp_write, item, le=1):
         fp_write(TYPE_NULL)
 
 
+def __encode_none(fp_write, item, le=1):
+    fp_write(TYPE_NULL)
+
+
+def __encode_bool(fp_write, item, le=1):
+    fp_write(TYPE_BOOL_TRUE if item else TYPE_BOOL_FALSE)
+
+
+def __encode_high_prec_int(fp_write, item, le=1):
+    try:
+        encoded_val = str(item).encode("utf-8")
+    except ValueError:
+        # more digits than allowed by sys.set_int_max_str_digits(), which does not
+        # apply to Decimal
+        __encode_decimal(fp_write, Decimal(item), le)
+        return
+    fp_write(TYPE_HIGH_PREC)
+    __encode_int(fp_write, len(encoded_val), le)
+    fp_write(encoded_val)
+
+
 def __encode_int(fp_write, item, le=1):
     if item >= 0:
         if item < 2**8:
             fp_write(__SMALL_UINTS_ENCODED[le][item])
         elif item < 2**16:
-            fp_write(TYPE_UINT16)
-            fp_write(__PACK_UINT16[le](item))
+            fp_write(__PACK_MARKER_UINT16[le](TYPE_UINT16, item))
         elif item < 2**32:
-            fp_write(TYPE_UINT32)
-            fp_write(__PACK_UINT32[le](item))
+            fp_write(__PACK_MARKER_UINT32[le](TYPE_UINT32, item))
         elif item < 2**64:
-            fp_write(TYPE_UINT64)
-            fp_write(__PACK_UINT64[le](item))
+            fp_write(__PACK_MARKER_UINT64[le](TYPE_UINT64, item))
         else:
-            __encode_decimal(fp_write, Decimal(item), le)
+            __encode_high_prec_int(fp_write, item, le)
     elif item >= -(2**7):
         fp_write(__SMALL_INTS_ENCODED[le][item])
     elif item >= -(2**15):
-        fp_write(TYPE_INT16)
-        fp_write(__PACK_INT16[le](item))
+        fp_write(__PACK_MARKER_INT16[le](TYPE_INT16, item))
     elif item >= -(2**31):
-        fp_write(TYPE_INT32)
-        fp_write(__PACK_INT32[le](item))
+        fp_write(__PACK_MARKER_INT32[le](TYPE_INT32, item))
     elif item >= -(2**63):
-        fp_write(TYPE_INT64)
-        fp_write(__PACK_INT64[le](item))
+        fp_write(__PACK_MARKER_INT64[le](TYPE_INT64, item))
     else:
-        __encode_decimal(fp_write, Decimal(item), le)
+        __encode_high_prec_int(fp_write, item, le)
 
 
 def __encode_float(fp_write, item, le=1):
     if 1.18e-38 <= abs(item) <= 3.4e38 or item == 0:
-        fp_write(TYPE_FLOAT32)
-        fp_write(__PACK_FLOAT32[le](item))
+        fp_write(__PACK_MARKER_FLOAT32[le](TYPE_FLOAT32, item))
     elif 2.23e-308 <= abs(item) < 1.8e308:
-        fp_write(TYPE_FLOAT64)
-        fp_write(__PACK_FLOAT64[le](item))
+        fp_write(__PACK_MARKER_FLOAT64[le](TYPE_FLOAT64, item))
     elif isinf(item) or isnan(item):
-        fp_write(TYPE_FLOAT32)
-        fp_write(__PACK_FLOAT32[le](item))
+        fp_write(__PACK_MARKER_FLOAT32[le](TYPE_FLOAT32, item))
     else:
         __encode_decimal(fp_write, Decimal(item), le)
 
 
 def __encode_float64(fp_write, item, le=1):
     if 2.23e-308 <= abs(item) < 1.8e308:
-        fp_write(TYPE_FLOAT64)
-        fp_write(__PACK_FLOAT64[le](item))
+        fp_write(__PACK_MARKER_FLOAT64[le](TYPE_FLOAT64, item))
     elif item == 0:
-        fp_write(TYPE_FLOAT32)
-        fp_write(__PACK_FLOAT32[le](item))
+        fp_write(__PACK_MARKER_FLOAT32[le](TYPE_FLOAT32, item))
     elif isinf(item) or isnan(item):
-        fp_write(TYPE_FLOAT64)
-        fp_write(__PACK_FLOAT64[le](item))
+        fp_write(__PACK_MARKER_FLOAT64[le](TYPE_FLOAT64, item))
     else:
         __encode_decimal(fp_write, Decimal(item), le)
 
 
+# Upper bound on the number of distinct mapping keys whose encoding is kept for
+# reuse during a single encode call
+__FRAMED_KEYS_MAX = 1024
+
+
+def __frame_key(key, le):
+    encoded_key = key.encode()
+    length = len(encoded_key)
+    if length < 2**8:
+        return __SMALL_UINTS_ENCODED[le][length] + encoded_key
+    chunks = []
+    __encode_int(chunks.append, length, le)
+    chunks.append(encoded_key)
+    return b"".join(chunks)
+
+
 def __encode_string(fp_write, item, le=1):
-    encoded_val = item.encode("utf-8")
+    encoded_val = item.encode()
     length = len(encoded_val)
+    # short strings (the common case) are written out in one go
     if length == 1:
-        fp_write(TYPE_CHAR)
+        fp_write(TYPE_CHAR + encoded_val)
+    elif length < 2**8:
+        fp_write(__SMALL_STRING_PREFIXES[le][length] + encoded_val)
     else:
         fp_write(TYPE_STRING)
-        if length < 2**8:
-            fp_write(__SMALL_UINTS_ENCODED[le][length])
-        else:
-            __encode_int(fp_write, length, le)
-    fp_write(encoded_val)
+        __encode_int(fp_write, length, le)
+        fp_write(encoded_val)
 
 
 def __encode_bytes(fp_write, item, uint8_bytes, le=1):
-    fp_write(__BYTES_ARRAY_PREFIX_DRAFT2 if uint8_bytes else __BYTES_ARRAY_PREFIX)
     length = len(item)
+    # the payload itself is written as is (rather than joined with the prefix) to
+    # avoid copying it
     if length < 2**8:
-        fp_write(__SMALL_UINTS_ENCODED[le][length])
+        prefixes = (
+            __SMALL_BYTES_PREFIXES_DRAFT2 if uint8_bytes else __SMALL_BYTES_PREFIXES
+        )
+        fp_write(prefixes[le][length])
     else:
+        fp_write(__BYTES_ARRAY_PREFIX_DRAFT2 if uint8_bytes else __BYTES_ARRAY_PREFIX)
         __encode_int(fp_write, length, le)
     fp_write(item)
     # no ARRAY_END since length was specified
 
 
+def __encode_memoryview(fp_write, item, uint8_bytes, le=1):
+    # written as a bytes array; a contiguous view is passed on as a flat byte view
+    # of the same buffer, so the payload is only copied once when output is joined
+    if item.c_contiguous:
+        item = item.cast("B")
+    else:
+        item = item.tobytes()
+    __encode_bytes(fp_write, item, uint8_bytes, le)
+
+
+def __encode_typed_array(fp_write, item, le=1):
+    """Writes a sequence whose elements are all int or all float as a strongly-typed
+    array. Returns False (without writing anything) if item is not suitable."""
+    item_type = type(item[0])
+    if item_type is not float and item_type is not int:
+        return False
+    for value in item:
+        if type(value) is not item_type:
+            return False
+
+    count = len(item)
+    values = None
+    if item_type is float:
+        marker, code = TYPE_FLOAT64, "d"
+    else:
+        # For longer sequences, integers are converted via np.fromiter() and their
+        # range taken from the resulting array rather than with min()/max() over the
+        # list. Below that (or without numpy), packing them directly is faster.
+        if np is not None and count >= __TYPED_ARRAY_BULK_MIN_LENGTH:
+            try:
+                values = np.fromiter(item, dtype="q", count=count)
+            except OverflowError:
+                # beyond int64 range
+                pass
+        if values is None:
+            low, high = min(item), max(item)
+        else:
+            low, high = int(values.min()), int(values.max())
+        for type_min, type_max, marker, code in __TYPED_ARRAY_INT_RANGES:
+            if type_min <= low and high <= type_max:
+                break
+        else:
+            return False
+
+    # Like ND-array payloads (see __encode_numpy), the values are written in native
+    # byte order regardless of le, since that is how the decoders read them back.
+    fp_write(ARRAY_START + CONTAINER_TYPE + marker + CONTAINER_COUNT)
+    __encode_int(fp_write, count, le)
+    if values is None:
+        fp_write(pack("=%d%s" % (count, code), *item))
+    else:
+        fp_write(values.astype("=" + code, copy=False).tobytes())
+    return True
+
+
+@lru_cache(maxsize=64)
 def __get_numpy_dtype_marker(dtype_str):
     """Get BJData type marker from numpy dtype string"""
     # Handle endianness prefix
@@ -238,23 +381,31 @@ def __analyze_string_field(values, soa_threshold=None):
                       Otherwise, use as dict threshold ratio.
 
     Returns:
-        tuple: (encoding_type, param, extra_data)
+        tuple: (encoding_type, param, extra_data, encoded)
             - 'fixed': param is max_length, extra_data is None
             - 'dict': param is index_bytes, extra_data is list of unique values
             - 'offset': param is offset_bytes, extra_data is None
+            encoded is the list of UTF-8 encoded values
     """
     if not values:
-        return "fixed", 1, None
+        return "fixed", 1, None, []
+
+    encoded = [v.encode("utf-8") for v in values]
+    lengths = list(map(len, encoded))
+    total_len = sum(lengths)
+
+    # Offset (and record index) width, which has to fit the largest of both
+    off_max = max(total_len, len(values) - 1)
+    off_bytes = 1 if off_max <= 255 else (2 if off_max <= 65535 else 4)
 
     # Force offset encoding if threshold is 0
     if soa_threshold == 0:
-        total_len = sum(len(v.encode("utf-8")) for v in values)
-        off_bytes = 1 if total_len <= 255 else (2 if total_len <= 65535 else 4)
-        return "offset", off_bytes, None
+        return "offset", off_bytes, None, encoded
 
-    unique_values = list(dict.fromkeys(values))
-    max_len = max(len(v.encode("utf-8")) for v in values)
-    total_len = sum(len(v.encode("utf-8")) for v in values)
+    # encoded length by unique value, in order of first occurrence
+    unique_lengths = dict(zip(values, lengths))
+    unique_values = list(unique_lengths)
+    max_len = max(lengths)
 
     count = len(values)
     num_unique = len(unique_values)
@@ -264,11 +415,10 @@ def __analyze_string_field(values, soa_threshold=None):
 
     # Dict: index_bytes * count + dict_overhead
     idx_bytes = 1 if num_unique <= 255 else (2 if num_unique <= 65535 else 4)
-    dict_overhead = sum(len(v.encode("utf-8")) + 2 for v in unique_values)
+    dict_overhead = sum(unique_lengths.values()) + 2 * num_unique
     dict_cost = idx_bytes * count + dict_overhead
 
     # Offset: index_bytes * count + (count+1) * offset_bytes + total_len
-    off_bytes = 1 if total_len <= 255 else (2 if total_len <= 65535 else 4)
     offset_cost = idx_bytes * count + (count + 1) * off_bytes + total_len
 
     # Use custom threshold or default 0.3
@@ -279,30 +429,96 @@ def __analyze_string_field(values, soa_threshold=None):
         and dict_cost < fixed_cost
         and dict_cost < offset_cost
     ):
-        return "dict", idx_bytes, unique_values
+        return "dict", idx_bytes, unique_values, encoded
     elif max_len > 32 and offset_cost < fixed_cost:
-        return "offset", off_bytes, None
+        return "offset", off_bytes, None, encoded
     else:
-        return "fixed", max_len, None
+        return "fixed", max_len, None, encoded
 
 
 def __can_encode_as_soa(item):
-    """Check if numpy structured array or list of dicts can be encoded as SOA"""
-    try:
-        import numpy as np
-    except ImportError:
+    """Check if numpy structured array can be encoded as SOA"""
+    if np is None:
         return False
     if isinstance(item, np.ndarray):
         if item.dtype.names is None:
             return False
         return __check_soa_dtype(item.dtype)
-    if isinstance(item, (list, tuple)) and len(item) > 0:
-        if all(isinstance(x, dict) for x in item):
-            keys = set(item[0].keys())
-            return all(set(x.keys()) == keys for x in item)
     return False
 
 
+def __records_to_structured(item, visiting=None):
+    """Convert a list (or tuple) of dicts with the same keys into a numpy structured
+    array, so it can be encoded as SOA. Returns None if item is not such a list or
+    if any field cannot be represented by a numpy dtype without loss, e.g. because
+    its values are None, of mixed type or integers beyond 64 bits. Records without
+    any keys (also nested ones) cannot be encoded as SOA either. visiting holds
+    the ids of the (outer) dicts being converted: circular references also result
+    in None, leaving them to be reported by the regular encoding path."""
+    if np is None:
+        return None
+    if not isinstance(item, (list, tuple)) or not item:
+        return None
+    keys = item[0].keys() if type(item[0]) is dict else None
+    if not keys or not all(
+        type(record) is dict and record.keys() == keys for record in item
+    ):
+        return None
+
+    if visiting is None:
+        visiting = set()
+    ids = set(map(id, item))
+    if not visiting.isdisjoint(ids):
+        return None
+    visiting |= ids
+
+    fields, columns = [], []
+    try:
+        for name in item[0]:
+            # numpy renames empty field names
+            if not isinstance(name, UNICODE_TYPE) or not name:
+                return None
+            column = __column_to_numpy([record[name] for record in item], visiting)
+            if column is None:
+                return None
+            fields.append((name, column.dtype))
+            columns.append(column)
+    finally:
+        visiting -= ids
+
+    result = np.empty(len(item), dtype=fields)
+    for (name, _), column in zip(fields, columns):
+        result[name] = column
+    return result
+
+
+def __column_to_numpy(column, visiting):
+    """Convert the values of one field of a list of records into a numpy array (or
+    None if not possible without loss), see __records_to_structured."""
+    types = set(map(type, column))
+    if types == {bool}:
+        return np.array(column, dtype="?")
+    if types == {int}:
+        low, high = min(column), max(column)
+        for type_min, type_max, _, dtype in __TYPED_ARRAY_INT_RANGES:
+            if type_min <= low and high <= type_max:
+                return np.array(column, dtype=dtype)
+        return None
+    if types == {float} or types == {int, float}:
+        # integers have to be exactly representable as float64
+        if int in types and max(abs(v) for v in column if type(v) is int) > 2**53:
+            return None
+        return np.array(column, dtype="f8")
+    if types == {str}:
+        # numpy strips trailing NUL characters
+        if any(value.endswith("\0") for value in column):
+            return None
+        return np.array(column)
+    if types == {dict}:
+        return __records_to_structured(column, visiting)
+    return None
+
+
 def __check_soa_dtype(dtype):
     """Recursively check if dtype fields are SOA-compatible"""
     for name in dtype.names:
@@ -363,70 +579,6 @@ def __encode_soa_schema_field(fp_write, field_name, field_info, le):
             )
 
 
-def __write_soa_field_value(fp_write, field, index, le):
-    """Write a single field value in SOA payload."""
-    ftype, values = field["type"], field["values"]
-
-    if ftype == "numeric":
-        if hasattr(values, "tobytes"):
-            fp_write(values[index].tobytes())
-        else:
-            __write_numeric_value(fp_write, field["marker"], values[index], le)
-    elif ftype == "bool":
-        fp_write(TYPE_BOOL_TRUE if values[index] else TYPE_BOOL_FALSE)
-    elif ftype == "null":
-        pass
-    elif ftype == "array":
-        fp_write(values[index].tobytes())
-    elif ftype == "nested":
-        for f in field["schema"]:
-            __write_soa_field_value(fp_write, f, index, le)
-    elif ftype == "string":
-        enc, val = field["encoding"], values[index]
-        if enc == "fixed":
-            encoded = val.encode("utf-8")
-            fp_write((encoded + b"\x00" * field["length"])[: field["length"]])
-        elif enc == "dict":
-            __write_index(fp_write, field["index_marker"], field["dict"].index(val), le)
-        elif enc == "offset":
-            __write_index(fp_write, field["index_marker"], index, le)
-
-
-def __write_numeric_value(fp_write, marker, val, le):
-    """Write a numeric value based on marker type."""
-    val = val if val is not None else 0
-    if marker == TYPE_INT8:
-        fp_write(pack("<b" if le else ">b", val))
-    elif marker == TYPE_UINT8:
-        fp_write(pack("<B" if le else ">B", val))
-    elif marker == TYPE_INT16:
-        fp_write(__PACK_INT16[le](val))
-    elif marker == TYPE_UINT16:
-        fp_write(__PACK_UINT16[le](val))
-    elif marker == TYPE_INT32:
-        fp_write(__PACK_INT32[le](val))
-    elif marker == TYPE_UINT32:
-        fp_write(__PACK_UINT32[le](val))
-    elif marker == TYPE_INT64:
-        fp_write(__PACK_INT64[le](val))
-    elif marker == TYPE_UINT64:
-        fp_write(__PACK_UINT64[le](val))
-    elif marker == TYPE_FLOAT32:
-        fp_write(__PACK_FLOAT32[le](val))
-    elif marker == TYPE_FLOAT64:
-        fp_write(__PACK_FLOAT64[le](val))
-
-
-def __write_index(fp_write, marker, idx, le):
-    """Write an index value for dict/offset string encoding."""
-    if marker == TYPE_UINT8:
-        fp_write(pack("<B" if le else ">B", idx))
-    elif marker == TYPE_UINT16:
-        fp_write(__PACK_UINT16[le](idx))
-    else:
-        fp_write(__PACK_UINT32[le](idx))
-
-
 def __build_field_schema(field_dtype, values, count, soa_threshold=None):
     """Build schema for a single field (handles nested/array/string/numeric)."""
     if field_dtype.names is not None:
@@ -452,8 +604,14 @@ def __build_field_schema(field_dtype, values, count, soa_threshold=None):
     dstr = field_dtype.str[1:] if field_dtype.str[0] in "<>|" else field_dtype.str
 
     if dstr.startswith("U") or dstr.startswith("S"):
-        str_vals = [str(values[i]) for i in range(count)]
-        enc_type, enc_param, enc_dict = __analyze_string_field(str_vals, soa_threshold)
+        if dstr.startswith("U"):
+            # converted in one go (rather than creating a numpy scalar per value)
+            str_vals = values.tolist()
+        else:
+            str_vals = [str(values[i]) for i in range(count)]
+        enc_type, enc_param, enc_dict, encoded = __analyze_string_field(
+            str_vals, soa_threshold
+        )
         idx_marker = (
             TYPE_UINT8
             if enc_param == 1
@@ -464,12 +622,14 @@ def __build_field_schema(field_dtype, values, count, soa_threshold=None):
             "encoding": enc_type,
             "length": enc_param,
             "dict": enc_dict,
+            "dict_map": ({s: i for i, s in enumerate(enc_dict)} if enc_dict else None),
             "index_marker": idx_marker,
             "values": str_vals,
+            "encoded": encoded,
         }
 
     if dstr in ("?", "b1"):
-        return {"type": "bool", "values": [bool(values[i]) for i in range(count)]}
+        return {"type": "bool", "values": values}
 
     return {
         "type": "numeric",
@@ -478,39 +638,65 @@ def __build_field_schema(field_dtype, values, count, soa_threshold=None):
     }
 
 
-def __collect_offset_fields(schema):
-    """Recursively collect offset-based string fields."""
-    result = []
-    for f in schema:
-        if f.get("encoding") == "offset":
-            result.append(f)
-        if f.get("type") == "nested":
-            result.extend(__collect_offset_fields(f["schema"]))
-    return result
+# Numpy dtypes of dict/offset string index markers
+__SOA_INDEX_DTYPES = {TYPE_UINT8: "u1", TYPE_UINT16: "u2", TYPE_UINT32: "u4"}
 
 
-def __encode_soa(fp_write, item, soa_format, le, soa_threshold=None):
-    """Encode numpy structured array or list of dicts as SOA format."""
-    import numpy as np
-    from itertools import accumulate
+def __soa_column(field, le):
+    """Get the payload of a SOA field as a numpy array with one element per record."""
+    ftype, values = field["type"], field["values"]
+    if ftype in ("numeric", "array"):
+        # numbers are written in native byte order, as read by the decoder
+        return values.astype(values.dtype.newbyteorder("="), copy=False)
+    if ftype == "bool":
+        return np.where(values, TYPE_BOOL_TRUE, TYPE_BOOL_FALSE)
+    if ftype == "nested":
+        return __soa_records([__soa_column(f, le) for f in field["schema"]])
+    if ftype == "string" and field["encoding"] == "fixed":
+        length = field["length"]
+        if not length:
+            return np.zeros((len(values), 0), dtype="u1")
+        # NUL-padded (numpy does not strip trailing NULs when writing the buffer)
+        return np.array(field["encoded"], dtype="S%d" % length)
+    # dict or offset encoded strings are written as indices
+    dtype = ("<" if le else ">") + __SOA_INDEX_DTYPES[field["index_marker"]]
+    if field["encoding"] == "dict":
+        return np.fromiter(
+            map(field["dict_map"].__getitem__, values), dtype=dtype, count=len(values)
+        )
+    # offset encoding refers to each record's own entry in the offset table
+    return np.arange(len(values), dtype=dtype)
+
+
+def __soa_records(columns):
+    """Interleave SOA field payloads (see __soa_column) into a packed structured
+    array, i.e. one row-major record per element."""
+    records = np.empty(
+        len(columns[0]),
+        dtype=[
+            ("f%d" % i, column.dtype, column.shape[1:])
+            for i, column in enumerate(columns)
+        ],
+    )
+    for i, column in enumerate(columns):
+        records["f%d" % i] = column
+    return records
 
+
+def __encode_soa(fp_write, item, soa_format, le, soa_threshold=None):
+    """Encode numpy structured array as SOA format."""
     is_row_major = soa_format in ("row", "r")
 
-    if isinstance(item, np.ndarray):
-        count = item.size
-        dims = item.shape
-        flat = item.flatten()
-        schema = []
-        for n in item.dtype.names:
-            fs = __build_field_schema(
-                item.dtype.fields[n][0], flat[n], count, soa_threshold
-            )
-            fs["name"] = n
-            schema.append(fs)
-    else:
-        count = len(item)
-        dims = [count]
-        schema = __build_dict_schema(item, count, soa_threshold)
+    count = item.size
+    dims = item.shape
+    flat = item.ravel()
+    schema = []
+    for n in item.dtype.names:
+        fs = __build_field_schema(
+            item.dtype.fields[n][0], flat[n], count, soa_threshold
+        )
+        fs["name"] = n
+        schema.append(fs)
 
     fp_write(ARRAY_START if is_row_major else OBJECT_START)
     fp_write(CONTAINER_TYPE + OBJECT_START)
@@ -526,22 +712,25 @@ def __encode_soa(fp_write, item, soa_format, le, soa_threshold=None):
     else:
         __encode_int(fp_write, count, le)
 
+    # fields are written with one call per column (or in total)
+    columns = [__soa_column(f, le) for f in schema]
     if is_row_major:
-        for i in range(count):
-            for f in schema:
-                __write_soa_field_value(fp_write, f, i, le)
+        fp_write(__soa_records(columns).tobytes())
     else:
-        for f in schema:
-            for i in range(count):
-                __write_soa_field_value(fp_write, f, i, le)
+        for column in columns:
+            fp_write(column.tobytes())
 
     for f in __collect_offset_fields(schema):
-        encoded = [v.encode("utf-8") for v in f["values"]]
-        offsets = [0] + list(accumulate(len(e) for e in encoded))
-        for off in offsets:
-            __write_index(fp_write, f["index_marker"], off, le)
-        for e in encoded:
-            fp_write(e)
+        encoded = f["encoded"]
+        offsets = np.zeros(
+            len(encoded) + 1,
+            dtype=("<" if le else ">") + __SOA_INDEX_DTYPES[f["index_marker"]],
+        )
+        offsets[1:] = np.cumsum(
+            np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        )
+        fp_write(offsets.tobytes())
+        fp_write(b"".join(encoded))
 
 
 def __collect_offset_fields(schema):
@@ -553,218 +742,165 @@ def __collect_offset_fields(schema):
             yield from __collect_offset_fields(f["schema"])
 
 
-def __write_soa_field_value(fp_write, field, index, le):
-    """Write a single field value in SOA payload."""
-    ftype, values = field["type"], field["values"]
-
-    if ftype == "numeric":
-        if hasattr(values, "tobytes"):
-            fp_write(values[index].tobytes())
-        else:
-            __write_numeric_value(fp_write, field["marker"], values[index], le)
-    elif ftype == "bool":
-        fp_write(TYPE_BOOL_TRUE if values[index] else TYPE_BOOL_FALSE)
-    elif ftype == "null":
-        pass
-    elif ftype == "array":
-        fp_write(values[index].tobytes())
-    elif ftype == "nested":
-        for f in field["schema"]:
-            __write_soa_field_value(fp_write, f, index, le)
-    elif ftype == "string":
-        enc, val = field["encoding"], values[index]
-        if enc == "fixed":
-            encoded = val.encode("utf-8")
-            fp_write((encoded + b"\x00" * field["length"])[: field["length"]])
-        elif enc == "dict":
-            __write_index(fp_write, field["index_marker"], field["dict"].index(val), le)
-        elif enc == "offset":
-            __write_index(fp_write, field["index_marker"], index, le)
-
-
-def __write_numeric_value(fp_write, marker, val, le):
-    """Write a numeric value based on marker type."""
-    val = val if val is not None else 0
-    packers = {
-        TYPE_INT8: lambda v: pack("<b" if le else ">b", v),
-        TYPE_UINT8: lambda v: pack("<B" if le else ">B", v),
-        TYPE_INT16: lambda v: __PACK_INT16[le](v),
-        TYPE_UINT16: lambda v: __PACK_UINT16[le](v),
-        TYPE_INT32: lambda v: __PACK_INT32[le](v),
-        TYPE_UINT32: lambda v: __PACK_UINT32[le](v),
-        TYPE_INT64: lambda v: __PACK_INT64[le](v),
-        TYPE_UINT64: lambda v: __PACK_UINT64[le](v),
-        TYPE_FLOAT32: lambda v: __PACK_FLOAT32[le](v),
-        TYPE_FLOAT64: lambda v: __PACK_FLOAT64[le](v),
-    }
-    fp_write(packers[marker](val))
-
-
-def __write_index(fp_write, marker, idx, le):
-    """Write an index value for dict/offset string encoding."""
-    if marker == TYPE_UINT8:
-        fp_write(pack("<B" if le else ">B", idx))
-    elif marker == TYPE_UINT16:
-        fp_write(__PACK_UINT16[le](idx))
+def __encode_scalar(fp_write, item, item_type, encode_float, uint8_bytes, le=1):
+    """Encodes item if it is of a scalar type not dispatched by exact type in
+    __encode_value (e.g. a subclass of int). Returns whether item was encoded."""
+    if isinstance(item, UNICODE_TYPE):
+        __encode_string(fp_write, item, le)
+    elif isinstance(item, INTEGER_TYPES) and not __is_numpy_type(item_type):
+        __encode_int(fp_write, item, le)
+    elif isinstance(item, float):
+        encode_float(fp_write, item, le)
+    elif isinstance(item, Decimal):
+        __encode_decimal(fp_write, item, le)
+    elif isinstance(item, BYTES_TYPES):
+        __encode_bytes(fp_write, item, uint8_bytes, le)
+    elif isinstance(item, memoryview):
+        __encode_memoryview(fp_write, item, uint8_bytes, le)
     else:
-        fp_write(__PACK_UINT32[le](idx))
+        return False
+    return True
 
 
-def __encode_value(
-    fp_write,
-    item,
-    seen_containers,
-    container_count,
-    sort_keys,
-    no_float32,
-    uint8_bytes,
-    islittle,
-    default,
-    soa_format,
-    soa_threshold=None,
-):
-    le = islittle
+# Maximum number of types the per-type caches below hold, so that dynamically
+# created classes cannot accumulate
+__TYPE_CACHE_MAX = 256
 
-    if isinstance(item, UNICODE_TYPE):
-        __encode_string(fp_write, item, le)
+# Whether a type is defined by numpy, by type (filled in as types are encountered)
+__NUMPY_TYPES = {}
 
-    elif item is None:
-        fp_write(TYPE_NULL)
+# Start marker of types which are not any of the scalars of __encode_scalar, by type:
+# OBJECT_START for mappings, ARRAY_START for sequences and None for neither. Filled
+# in as such types are encountered, so that the Mapping and Sequence checks are only
+# made once per type.
+__CONTAINER_STARTS = {dict: OBJECT_START, list: ARRAY_START, tuple: ARRAY_START}
 
-    elif item is True:
-        fp_write(TYPE_BOOL_TRUE)
+# Sort key of mapping items (for sort_keys)
+__ITEM_KEY = itemgetter(0)
 
-    elif item is False:
-        fp_write(TYPE_BOOL_FALSE)
 
-    elif isinstance(item, INTEGER_TYPES) and not (type(item).__module__ == "numpy"):
-        __encode_int(fp_write, item, le)
+def __is_numpy_type(value_type):
+    try:
+        return __NUMPY_TYPES[value_type]
+    except KeyError:
+        is_numpy = value_type.__module__ == "numpy"
+        if len(__NUMPY_TYPES) < __TYPE_CACHE_MAX:
+            __NUMPY_TYPES[value_type] = is_numpy
+        return is_numpy
 
-    elif isinstance(item, float):
-        if no_float32:
-            __encode_float64(fp_write, item, le)
+
+def __container_start(value, value_type):
+    try:
+        return __CONTAINER_STARTS[value_type]
+    except KeyError:
+        # order important since mappings could also be sequences
+        if isinstance(value, Mapping):
+            start = OBJECT_START
+        elif isinstance(value, Sequence):
+            start = ARRAY_START
         else:
-            __encode_float(fp_write, item, le)
+            start = None
+        if len(__CONTAINER_STARTS) < __TYPE_CACHE_MAX:
+            __CONTAINER_STARTS[value_type] = start
+        return start
 
-    elif isinstance(item, Decimal):
-        __encode_decimal(fp_write, item, le)
 
-    elif isinstance(item, BYTES_TYPES):
-        __encode_bytes(fp_write, item, uint8_bytes, le)
+def __write_new_key(fp_write, key, framed_keys, le):
+    # allow both str & unicode for Python 2
+    if not isinstance(key, TEXT_TYPES):
+        raise EncoderException("Mapping keys can only be strings")
+    framed = __frame_key(key, le)
+    if len(framed_keys) < __FRAMED_KEYS_MAX:
+        framed_keys[key] = framed
+    fp_write(framed)
 
-    # order important since mappings could also be sequences
-    elif isinstance(item, Mapping):
-        __encode_object(
-            fp_write,
-            item,
-            seen_containers,
-            container_count,
-            sort_keys,
-            no_float32,
-            uint8_bytes,
-            islittle,
-            default,
-            soa_format,
-        )
 
-    elif isinstance(item, Sequence):
+def __encode_whole(
+    fp_write,
+    value,
+    value_type,
+    start,
+    uint8_bytes,
+    le,
+    default,
+    soa_format,
+    soa_threshold,
+    typed_array,
+):
+    """Writes value in one go if it is a sequence to be encoded as SOA or as typed
+    array, or a numpy type (unless there is a default to replace it with). Returns
+    False (without writing anything) if value is a container to be entered instead.
+    """
+    if start is ARRAY_START:
         # Check for SOA-encodable list of dicts
-        if soa_format and __can_encode_as_soa(item):
-            __encode_soa(
-                fp_write, item, soa_format, le, soa_threshold
-            )  # Added soa_threshold
-        else:
-            __encode_array(
-                fp_write,
-                item,
-                seen_containers,
-                container_count,
-                sort_keys,
-                no_float32,
-                uint8_bytes,
-                islittle,
-                default,
-                soa_format,
-            )
-    elif default is not None:
-        __encode_value(
-            fp_write,
-            default(item),
-            seen_containers,
-            container_count,
-            sort_keys,
-            no_float32,
-            uint8_bytes,
-            islittle,
-            default,
-            soa_format,
-            soa_threshold,  # Added soa_threshold
+        if soa_format:
+            records = __records_to_structured(value)
+            if records is not None:
+                __encode_soa(fp_write, records, soa_format, le, soa_threshold)
+                return True
+        return bool(
+            typed_array
+            and len(value) >= __TYPED_ARRAY_MIN_LENGTH
+            and isinstance(value, (list, tuple))
+            and __encode_typed_array(fp_write, value, le)
         )
-    elif type(item).__module__ == "numpy":
-        # Check for SOA-compatible structured array
-        if soa_format and __can_encode_as_soa(item):
-            __encode_soa(
-                fp_write, item, soa_format, le, soa_threshold
-            )  # Added soa_threshold
-        elif soa_format is None and __can_encode_as_soa(item):
-            # Auto-enable column-major SOA for structured arrays
-            __encode_soa(
-                fp_write, item, "col", le, soa_threshold
-            )  # Added soa_threshold
-        else:
-            __encode_numpy(fp_write, item, uint8_bytes, islittle, default)
 
+    if start is not None or default is not None:
+        return False
+
+    if not __is_numpy_type(value_type):
+        raise EncoderException("Cannot encode item of type %s" % type(value))
+    # Check for SOA-compatible structured array
+    if soa_format and __can_encode_as_soa(value):
+        __encode_soa(fp_write, value, soa_format, le, soa_threshold)
+    elif soa_format is None and __can_encode_as_soa(value):
+        # Auto-enable column-major SOA for structured arrays
+        __encode_soa(fp_write, value, "col", le, soa_threshold)
     else:
-        raise EncoderException("Cannot encode item of type %s" % type(item))
+        __encode_numpy(fp_write, value, uint8_bytes, le, default)
+    return True
 
 
-def __encode_array(
-    fp_write,
-    item,
-    seen_containers,
-    container_count,
-    sort_keys,
-    no_float32,
-    uint8_bytes,
-    islittle,
-    default,
-    soa_format,
+def __enter_container(
+    fp_write, value, start, sort_keys, default, container_count, seen_containers, le
 ):
-    # circular reference check
-    container_id = id(item)
+    """Writes the start marker of a container (and its count if container_count is
+    set) after checking for circular references. Returns its values (or key-value
+    pairs), its id, its end marker (None if not required) and whether it is a
+    mapping. A replacement via default (start being None) is encoded as sole item of
+    a marker-less container without an id."""
+    if start is None:
+        return (default(value),), None, None, False
+
+    container_id = id(value)
     if container_id in seen_containers:
         raise ValueError("Circular reference detected")
-    seen_containers[container_id] = item
-
-    fp_write(ARRAY_START)
-    if container_count:
-        fp_write(CONTAINER_COUNT)
-        __encode_int(fp_write, len(item), islittle)
 
-    for value in item:
-        __encode_value(
-            fp_write,
-            value,
-            seen_containers,
-            container_count,
-            sort_keys,
-            no_float32,
-            uint8_bytes,
-            islittle,
-            default,
-            soa_format,
-        )
+    if start is OBJECT_START:
+        if sort_keys:
+            # (keys are unique, so there is no need to compare items)
+            children = sorted(value.items(), key=__ITEM_KEY)
+        else:
+            children = value.items()
+        end, is_mapping = OBJECT_END, True
+    else:
+        children, end, is_mapping = value, ARRAY_END, False
 
     if not container_count:
-        fp_write(ARRAY_END)
-
-    del seen_containers[container_id]
+        fp_write(start)
+        return children, container_id, end, is_mapping
+    count = len(value)
+    if count < 256:
+        fp_write(__SMALL_COUNTED_PREFIXES[start][le][count])
+    else:
+        fp_write(start + CONTAINER_COUNT)
+        __encode_int(fp_write, count, le)
+    return children, container_id, None, is_mapping
 
 
-def __encode_object(
+def __encode_value(
     fp_write,
     item,
-    seen_containers,
     container_count,
     sort_keys,
     no_float32,
@@ -772,50 +908,117 @@ def __encode_object(
     islittle,
     default,
     soa_format,
+    soa_threshold=None,
+    typed_array=False,
 ):
+    """Encodes item and everything nested within it without recursing: on entering a
+    container the iterator of its parent is pushed onto an explicit stack and popped
+    again once the container has been written out in full."""
     le = islittle
-    # circular reference check
-    container_id = id(item)
-    if container_id in seen_containers:
-        raise ValueError("Circular reference detected")
-    seen_containers[container_id] = item
-
-    fp_write(OBJECT_START)
-    if container_count:
-        fp_write(CONTAINER_COUNT)
-        __encode_int(fp_write, len(item), le)
-
-    for key, value in sorted(item.items()) if sort_keys else item.items():
-        # allow both str & unicode for Python 2
-        if not isinstance(key, TEXT_TYPES):
-            raise EncoderException("Mapping keys can only be strings")
-        encoded_key = key.encode("utf-8")
-        length = len(encoded_key)
-        if length < 2**8:
-            fp_write(__SMALL_UINTS_ENCODED[le][length])
-        else:
-            __encode_int(fp_write, length, le)
-        fp_write(encoded_key)
-
-        __encode_value(
-            fp_write,
-            value,
-            seen_containers,
-            container_count,
-            sort_keys,
-            no_float32,
-            uint8_bytes,
-            islittle,
-            default,
-            soa_format,
+    encode_float = __encode_float64 if no_float32 else __encode_float
+    # Encoders of exact built-in scalar types, by type. Other scalars (including
+    # subclasses) are handled by __encode_scalar.
+    scalar_encoders = {
+        int: __encode_int,
+        UNICODE_TYPE: __encode_string,
+        float: encode_float,
+        bool: __encode_bool,
+        type(None): __encode_none,
+    }
+    for bytes_type in BYTES_TYPES:
+        scalar_encoders[bytes_type] = lambda fp_write, value, le: __encode_bytes(
+            fp_write, value, uint8_bytes, le
         )
+    # Length-prefixed encodings of mapping keys seen so far, since keys tend to
+    # repeat (e.g. the same fields in every record of a list)
+    framed_keys = {}
+    # whether sequences might have to be written in one go (see __encode_whole)
+    whole_arrays = bool(soa_format or typed_array)
+    max_depth = getrecursionlimit()
+    seen_containers = set()
+    stack = []
+    # Iterator over values (or key-value pairs) of the container being encoded, its
+    # closing marker (None if not required), its id (None for the top level and
+    # marker-less containers) and whether that id is in seen_containers.
+    values, in_mapping, end_marker = iter((item,)), False, None
+    container_id, tracked = None, False
+
+    while True:
+        for value in values:
+            if in_mapping:
+                key, value = value
+                # (framed_keys only holds keys already checked to be text)
+                if key in framed_keys:
+                    fp_write(framed_keys[key])
+                else:
+                    __write_new_key(fp_write, key, framed_keys, le)
+
+            value_type = type(value)
+            encoder = scalar_encoders.get(value_type)
+            if encoder is not None:
+                encoder(fp_write, value, le)
+                continue
+            if value_type not in __CONTAINER_STARTS and __encode_scalar(
+                fp_write, value, value_type, encode_float, uint8_bytes, le
+            ):
+                continue
+
+            start = __container_start(value, value_type)
+            if (
+                start is None or (start is ARRAY_START and whole_arrays)
+            ) and __encode_whole(
+                fp_write,
+                value,
+                value_type,
+                start,
+                uint8_bytes,
+                le,
+                default,
+                soa_format,
+                soa_threshold,
+                typed_array,
+            ):
+                continue
+
+            # same limit as applies to the C extension's (recursive) encoder
+            if len(stack) >= max_depth:
+                raise RecursionError(
+                    "maximum recursion depth exceeded while encoding a container"
+                )
+            if container_id is not None and not tracked:
+                # Containers are only tracked once found to have nested ones, as
+                # only those can be part of a cycle. All ancestors of a container
+                # being entered are therefore tracked.
+                seen_containers.add(container_id)
+                tracked = True
+            stack.append((values, in_mapping, end_marker, container_id, tracked))
+
+            children, container_id, end, is_mapping = __enter_container(
+                fp_write,
+                value,
+                start,
+                sort_keys,
+                default,
+                container_count,
+                seen_containers,
+                le,
+            )
+            values, in_mapping, end_marker = iter(children), is_mapping, end
+            tracked = False
+            break
 
-    if not container_count:
-        fp_write(OBJECT_END)
-
-    del seen_containers[container_id]
+        else:
+            # current container has been written out in full
+            if end_marker is not None:
+                fp_write(end_marker)
+            if tracked:
+                seen_containers.discard(container_id)
+            if not stack:
+                return
+            values, in_mapping, end_marker, container_id, tracked = stack.pop()
 
 
+@lru_cache(maxsize=64)
 def __map_dtype(dtypestr):
     if len(dtypestr) == 3 and (
         dtypestr.startswith("<") or dtypestr.startswith("|") or dtypestr.startswith(">")
@@ -826,15 +1029,17 @@ def __map_dtype(dtypestr):
 
 
 def __encode_numpy(fp_write, item, uint8_bytes, islittle, default):
-    try:
-        import numpy as np
-    except ImportError:
+    if np is None:
         raise Exception("bjdata", "you must install 'numpy' to encode this data")
 
-    # TODO: need to detect big-endian data and swap bytes
     if np.isscalar(item):
-        fp_write(__map_dtype(item.dtype.str))
-        fp_write(item.data)
+        # scalars are decoded like any other number, so follow islittle
+        fp_write(
+            __map_dtype(item.dtype.str)
+            + np.asarray(
+                item, dtype=item.dtype.newbyteorder("<" if islittle else ">")
+            ).tobytes()
+        )
         return
 
     if not (type(item).__name__ == "ndarray" or type(item).__name__ == "chararray"):
@@ -852,15 +1057,19 @@ def __encode_numpy(fp_write, item, uint8_bytes, islittle, default):
         fp_write(item.data)
         return
 
-    if np.isfortran(item):
-        item = np.array(
-            item, order="C"
-        )  # currently, BJData ND-array syntax only support row-major
+    # currently, BJData ND-array syntax only support row-major; this also copies
+    # non-contiguous views and swaps non-native bytes (payloads are read back in
+    # native byte order), but is a no-op otherwise
+    if not item.flags.c_contiguous or not item.dtype.isnative:
+        item = item.astype(item.dtype.newbyteorder("="), order="C")
 
     fp_write(
-        ARRAY_START + CONTAINER_TYPE + __map_dtype(item.dtype.str) + CONTAINER_COUNT
+        ARRAY_START
+        + CONTAINER_TYPE
+        + __map_dtype(item.dtype.str)
+        + CONTAINER_COUNT
+        + ARRAY_START
     )
-    fp_write(ARRAY_START)
     for value in item.shape:
         __encode_int(fp_write, value, islittle)
     fp_write(ARRAY_END)
@@ -879,6 +1088,7 @@ def dump(
     default=None,
     soa_format=None,
     soa_threshold=None,
+    typed_array=False,
 ):
     """Writes the given object as BJData/UBJSON to the provided file-like object
 
@@ -913,6 +1123,13 @@ def dump(
                       - None: auto-select based on data analysis
                       - 0: force offset-table encoding for all strings
                       - 0.0-1.0: ratio threshold for dictionary encoding
+        typed_array (bool): Encode lists and tuples of at least 16 elements which
+                            are all int (or all float) as a strongly-typed array,
+                            using the smallest integer type covering all values
+                            (or float64). Such arrays decode as numpy ndarrays.
+                            Like numpy ndarray payloads, their values are
+                            written in native byte order (regardless of
+                            islittle), as read back by the decoders.
 
     Raises:
         EncoderException: If an encoding failure occured.
@@ -967,6 +1184,11 @@ def dump(
         (record array) or list of dicts with consistent keys, it will be
         encoded using the BJData Draft 4 SOA format.
 
+        A list of dicts is converted into a structured array first, using the
+        narrowest integer type per field (float64 for floats, bool and nested
+        dicts as sub-records). Lists with fields that cannot be represented that
+        way (e.g. None or mixed values) are encoded as regular arrays instead.
+
         String fields are automatically encoded using the most efficient method:
         - fixed: for short strings with similar lengths
         - dict: for categorical data with few unique values (<30% unique)
@@ -984,12 +1206,14 @@ def dump(
     """
     if not callable(fp.write):
         raise TypeError("fp.write not callable")
-    fp_write = fp.write
+    # Collect output in a single growing buffer and write it in one go rather than
+    # as many small writes. (Unlike dumpb, which joins a list of chunks, no final
+    # copy into a bytes object is needed here.)
+    buffer = bytearray()
 
     __encode_value(
-        fp_write,
+        buffer.extend,
         obj,
-        {},
         container_count,
         sort_keys,
         no_float32,
@@ -998,7 +1222,9 @@ def dump(
         default,
         soa_format,
         soa_threshold,
+        typed_array,
     )
+    fp.write(buffer)
 
 
 def dumpb(
@@ -1011,20 +1237,22 @@ def dumpb(
     default=None,
     soa_format=None,
     soa_threshold=None,
+    typed_array=False,
 ):
     """Returns the given object as BJData/UBJSON in a bytes instance. See dump() for
     available arguments."""
-    with BytesIO() as fp:
-        dump(
-            obj,
-            fp,
-            container_count=container_count,
-            sort_keys=sort_keys,
-            no_float32=no_float32,
-            uint8_bytes=uint8_bytes,
-            islittle=islittle,
-            default=default,
-            soa_format=soa_format,
-            soa_threshold=soa_threshold,
-        )
-        return fp.getvalue()
+    chunks = []
+    __encode_value(
+        chunks.append,
+        obj,
+        container_count,
+        sort_keys,
+        no_float32,
+        uint8_bytes,
+        islittle,
+        default,
+        soa_format,
+        soa_threshold,
+        typed_array,
+    )
+    return b"".join(chunks)
@@ -25,7 +25,7 @@
 
 /******************************************************************************/
 
-// container_count, sort_keys, no_float32, islittle, uint8_bytes, soa_format, soa_threshold
+// container_count, sort_keys, no_float32, islittle, uint8_bytes, soa_format, soa_threshold, typed_array
 static _bjdata_encoder_prefs_t _bjdata_encoder_prefs_defaults = {
     NULL,            /* default_func */
     0,               /* container_count */
@@ -34,7 +34,8 @@ static _bjdata_encoder_prefs_t _bjdata_encoder_prefs_defaults = {
     1,               /* islittle */
     0,               /* uint8_bytes */
     SOA_FORMAT_NONE, /* soa_format */
-    -1.0             /* soa_threshold: -1=auto, 0=force offset, 0.0-1.0=dict ratio */
+    -1.0,            /* soa_threshold: -1=auto, 0=force offset, 0.0-1.0=dict ratio */
+    0                /* typed_array */
 };
 
 // no_bytes, object_pairs_hook, islittle, uint8_bytes
@@ -63,10 +64,10 @@ PyDoc_STRVAR(_bjdata_dump__doc__, "See pure Python version (encoder.dump) for do
 #define FUNC_DEF_DUMP {"dump", (PyCFunction)_bjdata_dump, METH_VARARGS | METH_KEYWORDS, _bjdata_dump__doc__}
 static PyObject*
 _bjdata_dump(PyObject* self, PyObject* args, PyObject* kwargs) {
-    static const char* format = "OO|iiiiiOzO:dump";
+    static const char* format = "OO|iiiiiOzOi:dump";
     static char* keywords[] = {"obj", "fp", "container_count", "sort_keys", "no_float32",
                                "islittle", "uint8_bytes", "default", "soa_format",
-                               "soa_threshold", NULL
+                               "soa_threshold", "typed_array", NULL
                               };
 
     _bjdata_encoder_buffer_t* buffer = NULL;
@@ -82,7 +83,8 @@ _bjdata_dump(PyObject* self, PyObject* args, PyObject* kwargs) {
                                      &prefs.container_count, &prefs.sort_keys,
                                      &prefs.no_float32, &prefs.islittle,
                                      &prefs.uint8_bytes, &prefs.default_func,
-                                     &soa_format_str, &soa_threshold_obj)) {
+                                     &soa_format_str, &soa_threshold_obj,
+                                     &prefs.typed_array)) {
         goto bail;
     }
 
@@ -115,10 +117,10 @@ PyDoc_STRVAR(_bjdata_dumpb__doc__, "See pure Python version (encoder.dumpb) for
 #define FUNC_DEF_DUMPB {"dumpb", (PyCFunction)_bjdata_dumpb, METH_VARARGS | METH_KEYWORDS, _bjdata_dumpb__doc__}
 static PyObject*
 _bjdata_dumpb(PyObject* self, PyObject* args, PyObject* kwargs) {
-    static const char* format = "O|iiiiiOzO:dumpb";
+    static const char* format = "O|iiiiiOzOi:dumpb";
     static char* keywords[] = {"obj", "container_count", "sort_keys", "no_float32",
                                "islittle", "uint8_bytes", "default", "soa_format",
-                               "soa_threshold", NULL
+                               "soa_threshold", "typed_array", NULL
                               };
 
     _bjdata_encoder_buffer_t* buffer = NULL;
@@ -132,7 +134,8 @@ _bjdata_dumpb(PyObject* self, PyObject* args, PyObject* kwargs) {
                                      &prefs.container_count, &prefs.sort_keys,
                                      &prefs.no_float32, &prefs.islittle,
                                      &prefs.uint8_bytes, &prefs.default_func,
-                                     &soa_format_str, &soa_threshold_obj)) {
+                                     &soa_format_str, &soa_threshold_obj,
+                                     &prefs.typed_array)) {
         goto bail;
     }
 
@@ -18,6 +18,7 @@
 #include <Python.h>
 #include <bytesobject.h>
 #include <string.h>
+#include <limits.h>
 
 #define NO_IMPORT_ARRAY
 
@@ -41,9 +42,12 @@ static char bytes_array_prefix[] = {ARRAY_START, CONTAINER_TYPE, TYPE_BYTE, CONT
 #define BUFFER_INITIAL_SIZE 64
 // encoder buffer size when using fp (i.e. minimum number of bytes to buffer before writing out)
 #define BUFFER_FP_SIZE 256
+// sequences shorter than this are not worth scanning for typed-array encoding (typed_array option)
+#define TYPED_ARRAY_MIN_LENGTH 16
 
 static PyObject* EncoderException = NULL;
 static PyTypeObject* PyDec_Type = NULL;
+static PyObject* RecordsToStructured = NULL;
 #define PyDec_Check(v) PyObject_TypeCheck(v, PyDec_Type)
 
 /******************************************************************************/
@@ -58,16 +62,31 @@ static int _encoder_buffer_write(_bjdata_encoder_buffer_t* buffer, const char* c
         BAIL_ON_NONZERO(ret);\
     }
 
-#define WRITE_OR_BAIL(str, len) BAIL_ON_NONZERO(_encoder_buffer_write(buffer, (str), len))
+// Chunks which fit into the buffer without filling it (which, when writing to fp, triggers a flush) are copied
+// directly rather than via _encoder_buffer_write()
+#define WRITE_OR_BAIL(str, str_len) {\
+        size_t wlen = (str_len);\
+        if (wlen < buffer->len - buffer->pos) {\
+            memcpy(&(buffer->raw[buffer->pos]), (str), wlen);\
+            buffer->pos += wlen;\
+        } else {\
+            BAIL_ON_NONZERO(_encoder_buffer_write(buffer, (str), wlen));\
+        }\
+    }
 #define WRITE_CHAR_OR_BAIL(c) {\
-        char ctmp = (c);\
-        WRITE_OR_BAIL(&ctmp, 1);\
+        if (buffer->pos + 1 < buffer->len) {\
+            buffer->raw[buffer->pos++] = (c);\
+        } else {\
+            char ctmp = (c);\
+            BAIL_ON_NONZERO(_encoder_buffer_write(buffer, &ctmp, 1));\
+        }\
     }
 
 /* These functions return non-zero on failure (an exception will have been set). Note that no type checking is performed
  * where a Python type is mentioned in the function name!
  */
 static int _encode_PyBytes(PyObject* obj, _bjdata_encoder_buffer_t* buffer);
+static int _encode_PyLong_as_high_prec(PyObject* obj, _bjdata_encoder_buffer_t* buffer);
 static int _encode_PyObject_as_PyDecimal(PyObject* obj, _bjdata_encoder_buffer_t* buffer);
 static int _encode_PyDecimal(PyObject* obj, _bjdata_encoder_buffer_t* buffer);
 static int _encode_PyUnicode(PyObject* obj, _bjdata_encoder_buffer_t* buffer);
@@ -77,6 +96,7 @@ static int _encode_longlong(long long num, _bjdata_encoder_buffer_t* buffer);
 #if PY_MAJOR_VERSION < 3
     static int _encode_PyInt(PyObject* obj, _bjdata_encoder_buffer_t* buffer);
 #endif
+static int _encode_typed_array(PyObject* seq, Py_ssize_t len, _bjdata_encoder_buffer_t* buffer);
 static int _encode_PySequence(PyObject* obj, _bjdata_encoder_buffer_t* buffer);
 static int _encode_mapping_key(PyObject* obj, _bjdata_encoder_buffer_t* buffer);
 static int _encode_PyMapping(PyObject* obj, _bjdata_encoder_buffer_t* buffer);
@@ -180,9 +200,15 @@ static int _encoder_buffer_write(_bjdata_encoder_buffer_t* buffer, const char* c
 
     // no write method, use buffer only
     if (NULL == buffer->fp_write) {
-        // increase buffer size if too small
+        // increase buffer size if too small: double it, but fit a larger chunk (e.g. an ndarray payload) exactly.
+        // Since the buffer is shrunk to fit when finalised, overshooting would make every such allocation larger
+        // than the one freed last, which malloc then keeps serving from newly mapped pages.
         if (chunk_len > (buffer->len - buffer->pos)) {
-            for (new_len = buffer->len; new_len < (buffer->pos + chunk_len); new_len *= 2);
+            new_len = buffer->len * 2;
+
+            if (new_len < (buffer->pos + chunk_len)) {
+                new_len = buffer->pos + chunk_len;
+            }
 
             BAIL_ON_NONZERO(_PyBytes_Resize(&buffer->obj, new_len));
             buffer->raw = PyBytes_AS_STRING(buffer->obj);
@@ -286,6 +312,41 @@ bail:
     return 1;
 }
 
+static int _encode_PyMemoryView(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
+    Py_buffer view;
+    int have_view = 0;
+    PyObject* bytes;
+    int result;
+
+    if (!PyBuffer_IsContiguous(PyMemoryView_GET_BUFFER(obj), 'C')) {
+        // strided views are gathered into a contiguous copy first
+        BAIL_ON_NULL(bytes = PyBytes_FromObject(obj));
+        result = _encode_PyBytes(bytes, buffer);
+        Py_DECREF(bytes);
+        return result;
+    }
+
+    // contiguous views are written straight from the underlying buffer
+    BAIL_ON_NONZERO(PyObject_GetBuffer(obj, &view, PyBUF_SIMPLE));
+    have_view = 1;
+
+    WRITE_OR_BAIL(bytes_array_prefix, sizeof(bytes_array_prefix));
+    BAIL_ON_NONZERO(_encode_longlong(view.len, buffer));
+    WRITE_OR_BAIL(view.buf, view.len);
+    // no ARRAY_END since length was specified
+
+    PyBuffer_Release(&view);
+    return 0;
+
+bail:
+
+    if (have_view) {
+        PyBuffer_Release(&view);
+    }
+
+    return 1;
+}
+
 /******************************************************************************/
 
 /* Unified marker lookup - used by both regular arrays and SOA */
@@ -645,7 +706,7 @@ static inline void _get_index_type(Py_ssize_t count, int* size, char* marker) {
 static int _analyze_string_field(PyArrayObject* flat, PyObject* field_name,
                                  Py_ssize_t field_index, npy_intp count,
                                  double threshold, _string_field_info_t* info) {
-    PyObject* unique_set = NULL;
+    PyObject* unique_set = NULL;  /* dict (rather than set), to keep unique values in order of first occurrence */
     PyObject* unique_list = NULL;
     Py_ssize_t max_len = 0;
     Py_ssize_t total_len = 0;
@@ -660,7 +721,7 @@ static int _analyze_string_field(PyArrayObject* flat, PyObject* field_name,
         return 0;
     }
 
-    BAIL_ON_NULL(unique_set = PySet_New(NULL));
+    BAIL_ON_NULL(unique_set = PyDict_New());
 
     /* First pass: collect unique values and compute lengths */
     for (j = 0; j < count; j++) {
@@ -698,11 +759,16 @@ static int _analyze_string_field(PyArrayObject* flat, PyObject* field_name,
         total_len += len;
         Py_DECREF(utf8);
 
-        PySet_Add(unique_set, val);
+        /* (an existing key keeps its position) */
+        if (PyDict_SetItem(unique_set, val, Py_None)) {
+            Py_DECREF(val);
+            goto bail;
+        }
+
         Py_DECREF(val);
     }
 
-    Py_ssize_t num_unique = PySet_GET_SIZE(unique_set);
+    Py_ssize_t num_unique = PyDict_GET_SIZE(unique_set);
     info->total_len = total_len;
     info->fixed_len = max_len > 0 ? max_len : 1;
 
@@ -725,7 +791,7 @@ static int _analyze_string_field(PyArrayObject* flat, PyObject* field_name,
 
     /* Calculate dict strings total length */
     Py_ssize_t dict_strings_total = 0;
-    unique_list = PySequence_List(unique_set);
+    unique_list = PyDict_Keys(unique_set);
 
     if (unique_list) {
         for (Py_ssize_t i = 0; i < num_unique; i++) {
@@ -753,6 +819,19 @@ static int _analyze_string_field(PyArrayObject* flat, PyObject* field_name,
         info->dict_list = unique_list;
         unique_list = NULL;
         info->dict_count = num_unique;
+        BAIL_ON_NULL(info->dict_map = PyDict_New());
+
+        for (Py_ssize_t i = 0; i < num_unique; i++) {
+            PyObject* index = PyLong_FromSsize_t(i);
+
+            if (!index || PyDict_SetItem(info->dict_map, PyList_GET_ITEM(info->dict_list, i), index)) {
+                Py_XDECREF(index);
+                goto bail;
+            }
+
+            Py_DECREF(index);
+        }
+
         info->index_size = idx_size;
         info->index_marker = idx_marker;
     } else if (max_len > 32 && offset_cost < fixed_cost) {
@@ -839,14 +918,8 @@ static int _write_string_value(PyObject* str_val, _string_field_info_t* info,
         }
 
     } else if (info->encoding == SOA_STRING_DICT) {
-        Py_ssize_t idx = PySequence_Index(info->dict_list, str_val);
-
-        if (idx < 0) {
-            PyErr_Clear();
-            idx = 0;
-        }
-
-        ret = _write_index_value(idx, info->index_size, buffer);
+        PyObject* index = PyDict_GetItem(info->dict_map, str_val);
+        ret = _write_index_value(index ? PyLong_AsSsize_t(index) : 0, info->index_size, buffer);
 
     } else {  /* SOA_STRING_OFFSET */
         ret = _write_index_value(record_index, info->index_size, buffer);
@@ -896,7 +969,7 @@ static int _encode_soa(PyArrayObject* arr, _bjdata_encoder_buffer_t* buffer, int
     ndim = PyArray_NDIM(arr);
     threshold = (buffer->prefs.soa_threshold >= 0) ? buffer->prefs.soa_threshold : 0.3;
 
-    BAIL_ON_NULL(flat = (PyArrayObject*)PyArray_Flatten(arr, NPY_CORDER));
+    BAIL_ON_NULL(flat = (PyArrayObject*)PyArray_Ravel(arr, NPY_CORDER));
 
     /* Allocate per-field arrays */
     BAIL_ON_NULL(field_offset = calloc(nf, sizeof(Py_ssize_t)));
@@ -1086,6 +1159,7 @@ static int _encode_soa(PyArrayObject* arr, _bjdata_encoder_buffer_t* buffer, int
     /* Cleanup */
     for (i = 0; i < nf; i++) {
         Py_XDECREF(str_info[i].dict_list);
+        Py_XDECREF(str_info[i].dict_map);
         Py_XDECREF(str_values[i]);
     }
 
@@ -1104,6 +1178,7 @@ bail:
     if (str_info) {
         for (i = 0; i < nf; i++) {
             Py_XDECREF(str_info[i].dict_list);
+            Py_XDECREF(str_info[i].dict_map);
         }
 
         free(str_info);
@@ -1179,6 +1254,27 @@ static int _encode_NDarray(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
         return 1;
     }
 
+    /* BJData ND-arrays are row-major and their payload is read back in native byte order, whereas scalars are
+       decoded like any other number and so use the byte order selected by islittle - convert (copy) only if the
+       array does not match already */
+    {
+        PyArray_Descr* descr = PyArray_DESCR(arr);
+        char byteorder = (ndim > 0) ? NPY_NATIVE : (buffer->prefs.islittle ? NPY_LITTLE : NPY_BIG);
+        PyArrayObject* converted;
+
+        if (marker == TYPE_STRING || PyArray_ISNBO(byteorder) == PyArray_ISNOTSWAPPED(arr)) {
+            Py_INCREF(descr);
+        } else {
+            BAIL_ON_NULL(descr = PyArray_DescrNewByteorder(descr, byteorder));
+        }
+
+        /* steals reference to descr */
+        BAIL_ON_NULL(converted = (PyArrayObject*)PyArray_FromAny((PyObject*)arr, descr, 0, 0,
+                                 NPY_ARRAY_C_CONTIGUOUS, NULL));
+        Py_DECREF(arr);
+        arr = converted;
+    }
+
     if (ndim == 0) { /*scalar*/
         WRITE_CHAR_OR_BAIL((char)marker);
 
@@ -1249,6 +1345,40 @@ bail:
     return 1;
 }
 
+static int _encode_PyLong_as_high_prec(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
+    PyObject* str = NULL;
+    const char* raw;
+    Py_ssize_t len;
+
+    str = PyObject_Str(obj);
+
+    if (!str) {
+        // more digits than allowed by sys.set_int_max_str_digits(), which does not apply to Decimal
+        if (PyErr_ExceptionMatches(PyExc_ValueError)) {
+            PyErr_Clear();
+            return _encode_PyObject_as_PyDecimal(obj, buffer);
+        }
+
+        goto bail;
+    }
+
+#if PY_MAJOR_VERSION >= 3
+    BAIL_ON_NULL(raw = PyUnicode_AsUTF8AndSize(str, &len));
+#else
+    raw = PyString_AS_STRING(str);
+    len = PyString_GET_SIZE(str);
+#endif
+    WRITE_CHAR_OR_BAIL(TYPE_HIGH_PREC);
+    BAIL_ON_NONZERO(_encode_longlong(len, buffer));
+    WRITE_OR_BAIL(raw, len);
+    Py_DECREF(str);
+    return 0;
+
+bail:
+    Py_XDECREF(str);
+    return 1;
+}
+
 static int _encode_PyDecimal(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
     PyObject* is_finite;
     PyObject* str = NULL;
@@ -1291,13 +1421,18 @@ bail:
 /******************************************************************************/
 
 static int _encode_PyUnicode(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
-    PyObject* str;
+    PyObject* str = NULL;
     const char* raw;
     Py_ssize_t len;
 
+#if PY_MAJOR_VERSION >= 3
+    // UTF-8 representation is cached by (or for ASCII, identical to) the object
+    BAIL_ON_NULL(raw = PyUnicode_AsUTF8AndSize(obj, &len));
+#else
     BAIL_ON_NULL(str = PyUnicode_AsEncodedString(obj, "utf-8", NULL));
     raw = PyBytes_AS_STRING(str);
     len = PyBytes_GET_SIZE(str);
+#endif
 
     if (1 == len) {
         WRITE_CHAR_OR_BAIL(TYPE_CHAR);
@@ -1307,7 +1442,7 @@ static int _encode_PyUnicode(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
     }
 
     WRITE_OR_BAIL(raw, len);
-    Py_DECREF(str);
+    Py_XDECREF(str);
     return 0;
 
 bail:
@@ -1536,7 +1671,7 @@ static int _encode_PyLong(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
 
         if (PyErr_Occurred()) {
             PyErr_Clear();
-            BAIL_ON_NONZERO(_encode_PyObject_as_PyDecimal(obj, buffer));
+            BAIL_ON_NONZERO(_encode_PyLong_as_high_prec(obj, buffer));
         } else {
             WRITE_UINT64_OR_BAIL(unum);
         }
@@ -1568,49 +1703,207 @@ static int _encode_PyInt(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
 
 /******************************************************************************/
 
+/* Writes a sequence (as returned by PySequence_Fast) whose items are all exact ints or all exact floats as a
+ * strongly-typed array, using the narrowest integer type covering all values (unsigned types preferred for
+ * non-negative values) or float64. Returns 1 if written, 0 if the sequence is not suitable (nothing written) and
+ * -1 on failure (an exception will have been set).
+ */
+static int _encode_typed_array(PyObject* seq, Py_ssize_t len, _bjdata_encoder_buffer_t* buffer) {
+    PyObject** items = PySequence_Fast_ITEMS(seq);
+    PyTypeObject* type = Py_TYPE(items[0]);
+    char header[] = {ARRAY_START, CONTAINER_TYPE, 0, CONTAINER_COUNT};
+    char numtmp[9];
+    // like ND-array payloads, written in native byte order (regardless of islittle), since that is how the decoders
+    // read them back
+    int islittle = PY_LITTLE_ENDIAN;
+    long long low = LLONG_MAX, high = LLONG_MIN, value;
+    unsigned long long uhigh = 0, uvalue;
+    int overflow, is_unsigned, size;
+    Py_ssize_t i;
+
+    for (i = 1; i < len; i++) {
+        if (Py_TYPE(items[i]) != type) {
+            return 0;
+        }
+    }
+
+    if (&PyFloat_Type == type) {
+        header[2] = TYPE_FLOAT64;
+        WRITE_OR_BAIL(header, sizeof(header));
+        BAIL_ON_NONZERO(_encode_longlong(len, buffer));
+
+        for (i = 0; i < len; i++) {
+            BAIL_ON_NONZERO(_pyfuncs_ubj_PyFloat_Pack8(PyFloat_AS_DOUBLE(items[i]), (unsigned char*)numtmp, islittle));
+            WRITE_OR_BAIL(numtmp, 8);
+        }
+
+        return 1;
+    } else if (&PyLong_Type != type) {
+        return 0;
+    }
+
+    // determine value range, values beyond int64 are only supported if all non-negative (uint64)
+    for (i = 0; i < len; i++) {
+        value = PyLong_AsLongLongAndOverflow(items[i], &overflow);
+
+        if (overflow > 0) {
+            uvalue = PyLong_AsUnsignedLongLong(items[i]);
+
+            if (PyErr_Occurred()) {
+                PyErr_Clear();
+                return 0;
+            }
+
+            uhigh = MAX(uhigh, uvalue);
+        } else if (overflow < 0) {
+            return 0;
+        } else if (-1 == value && PyErr_Occurred()) {
+            goto bail;
+        } else {
+            low = MIN(low, value);
+            high = MAX(high, value);
+        }
+    }
+
+    if (uhigh > 0 && low < 0) {
+        return 0;
+    }
+
+    is_unsigned = (low >= 0);
+
+    if (is_unsigned) {
+        uhigh = MAX(uhigh, (unsigned long long)MAX(high, 0));
+
+        if (uhigh < POWER_TWO(8)) {
+            header[2] = TYPE_UINT8;
+            size = 1;
+        } else if (uhigh < POWER_TWO(16)) {
+            header[2] = TYPE_UINT16;
+            size = 2;
+        } else if (uhigh < POWER_TWO(32)) {
+            header[2] = TYPE_UINT32;
+            size = 4;
+        } else {
+            header[2] = TYPE_UINT64;
+            size = 8;
+        }
+    } else if (low >= -(POWER_TWO(7)) && high < POWER_TWO(7)) {
+        header[2] = TYPE_INT8;
+        size = 1;
+    } else if (low >= -(POWER_TWO(15)) && high < POWER_TWO(15)) {
+        header[2] = TYPE_INT16;
+        size = 2;
+    } else if (low >= -(POWER_TWO(31)) && high < POWER_TWO(31)) {
+        header[2] = TYPE_INT32;
+        size = 4;
+    } else {
+        header[2] = TYPE_INT64;
+        size = 8;
+    }
+
+    WRITE_OR_BAIL(header, sizeof(header));
+    BAIL_ON_NONZERO(_encode_longlong(len, buffer));
+
+    for (i = 0; i < len; i++) {
+        if (is_unsigned) {
+            uvalue = PyLong_AsUnsignedLongLong(items[i]);
+        } else {
+            uvalue = (unsigned long long)PyLong_AsLongLong(items[i]);
+        }
+
+        if (PyErr_Occurred()) {
+            goto bail;
+        }
+
+        WRITE_INT_INTO_NUMTMP(uvalue, size);
+        WRITE_OR_BAIL(&numtmp[1], size);
+    }
+
+    return 1;
+
+bail:
+    return -1;
+}
+
+/* Whether obj is of a built-in type which cannot refer to other objects. Containers holding only such objects cannot be
+ * part of a circular reference, so are not tracked. */
+static int _is_leaf(PyObject* obj) {
+    return (Py_None == obj || PyBool_Check(obj) || PyLong_CheckExact(obj) || PyFloat_CheckExact(obj) ||
+            PyUnicode_CheckExact(obj) || PyBytes_CheckExact(obj));
+}
+
 static int _encode_PySequence(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
-    PyObject* ident;        // id of sequence (for checking circular reference)
+    PyObject* ident = NULL; // id of sequence (for checking circular reference)
     PyObject* seq = NULL;   // converted sequence (via PySequence_Fast)
+    PyObject* records;      // list of dicts as numpy structured array (for SOA)
     Py_ssize_t len;
     Py_ssize_t i;
     int seen;
+    int typed = 0;
+    int result;
 
-    // circular reference check
-    BAIL_ON_NULL(ident = PyLong_FromVoidPtr(obj));
+    // list of dicts with the same keys, written as SOA if requested
+    if (buffer->prefs.soa_format != SOA_FORMAT_NONE && (PyList_Check(obj) || PyTuple_Check(obj)) &&
+            PySequence_Fast_GET_SIZE(obj) > 0 && PyDict_CheckExact(PySequence_Fast_GET_ITEM(obj, 0))) {
+        BAIL_ON_NULL(records = PyObject_CallFunctionObjArgs(RecordsToStructured, obj, NULL));
 
-    if ((seen = PySet_Contains(buffer->markers, ident))) {
-        if (-1 != seen) {
-            PyErr_SetString(PyExc_ValueError, "Circular reference detected");
+        if (records != Py_None) {
+            result = _encode_soa((PyArrayObject*)records, buffer, buffer->prefs.soa_format == SOA_FORMAT_ROW);
+            Py_DECREF(records);
+            return result;
         }
 
-        goto bail;
+        Py_DECREF(records);
     }
 
-    BAIL_ON_NONZERO(PySet_Add(buffer->markers, ident));
-
     BAIL_ON_NULL(seq = PySequence_Fast(obj, "_encode_PySequence expects sequence"));
     len = PySequence_Fast_GET_SIZE(seq);
 
-    WRITE_CHAR_OR_BAIL(ARRAY_START);
+    for (i = 0; i < len && _is_leaf(PySequence_Fast_GET_ITEM(seq, i)); i++);
 
-    if (buffer->prefs.container_count) {
-        WRITE_CHAR_OR_BAIL(CONTAINER_COUNT);
-        BAIL_ON_NONZERO(_encode_longlong(len, buffer));
+    // circular reference check (unless only holding leaf values)
+    if (i < len) {
+        BAIL_ON_NULL(ident = PyLong_FromVoidPtr(obj));
+
+        if ((seen = PySet_Contains(buffer->markers, ident))) {
+            if (-1 != seen) {
+                PyErr_SetString(PyExc_ValueError, "Circular reference detected");
+            }
+
+            goto bail;
+        }
+
+        BAIL_ON_NONZERO(PySet_Add(buffer->markers, ident));
     }
 
-    for (i = 0; i < len; i++) {
-        BAIL_ON_NONZERO(_bjdata_encode_value(PySequence_Fast_GET_ITEM(seq, i), buffer));
+    // as with the Python encoder, only lists & tuples (not any sequence)
+    if (buffer->prefs.typed_array && len >= TYPED_ARRAY_MIN_LENGTH &&
+        (PyList_Check(obj) || PyTuple_Check(obj))) {
+        BAIL_ON_NEGATIVE(typed = _encode_typed_array(seq, len, buffer));
     }
 
-    if (!buffer->prefs.container_count) {
-        WRITE_CHAR_OR_BAIL(ARRAY_END);
+    if (!typed) {
+        WRITE_CHAR_OR_BAIL(ARRAY_START);
+
+        if (buffer->prefs.container_count) {
+            WRITE_CHAR_OR_BAIL(CONTAINER_COUNT);
+            BAIL_ON_NONZERO(_encode_longlong(len, buffer));
+        }
+
+        for (i = 0; i < len; i++) {
+            BAIL_ON_NONZERO(_bjdata_encode_value(PySequence_Fast_GET_ITEM(seq, i), buffer));
+        }
+
+        if (!buffer->prefs.container_count) {
+            WRITE_CHAR_OR_BAIL(ARRAY_END);
+        }
     }
 
-    if (-1 == PySet_Discard(buffer->markers, ident)) {
+    if (NULL != ident && -1 == PySet_Discard(buffer->markers, ident)) {
         goto bail;
     }
 
-    Py_DECREF(ident);
+    Py_XDECREF(ident);
     Py_DECREF(seq);
     return 0;
 
@@ -1627,26 +1920,33 @@ static int _encode_mapping_key(PyObject* obj, _bjdata_encoder_buffer_t* buffer)
     const char* raw;
     Py_ssize_t len;
 
-    if (PyUnicode_Check(obj)) {
-        BAIL_ON_NULL(str = PyUnicode_AsEncodedString(obj, "utf-8", NULL));
-    }
+#if PY_MAJOR_VERSION >= 3
 
-#if PY_MAJOR_VERSION < 3
-    else if (PyString_Check(obj)) {
-        BAIL_ON_NULL(str = PyString_AsEncodedObject(obj, "utf-8", NULL));
+    if (!PyUnicode_Check(obj)) {
+        PyErr_SetString(EncoderException, "Mapping keys can only be strings");
+        goto bail;
     }
 
-#endif
-    else {
+    // UTF-8 representation is cached by (or for ASCII, identical to) the object
+    BAIL_ON_NULL(raw = PyUnicode_AsUTF8AndSize(obj, &len));
+#else
+
+    if (PyUnicode_Check(obj)) {
+        BAIL_ON_NULL(str = PyUnicode_AsEncodedString(obj, "utf-8", NULL));
+    } else if (PyString_Check(obj)) {
+        BAIL_ON_NULL(str = PyString_AsEncodedObject(obj, "utf-8", NULL));
+    } else {
         PyErr_SetString(EncoderException, "Mapping keys can only be strings");
         goto bail;
     }
 
     raw = PyBytes_AS_STRING(str);
     len = PyBytes_GET_SIZE(str);
+#endif
+
     BAIL_ON_NONZERO(_encode_longlong(len, buffer));
     WRITE_OR_BAIL(raw, len);
-    Py_DECREF(str);
+    Py_XDECREF(str);
     return 0;
 
 bail:
@@ -1655,26 +1955,53 @@ bail:
 }
 
 static int _encode_PyMapping(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
-    PyObject* ident; // id of sequence (for checking circular reference)
+    PyObject* ident = NULL; // id of sequence (for checking circular reference)
     PyObject* items = NULL;
     PyObject* iter = NULL;
     PyObject* item = NULL;
+    PyObject* key;
+    PyObject* value;
+    Py_ssize_t pos = 0;
+    Py_ssize_t len;
+    Py_ssize_t i;
     int seen;
+    int ret;
+    // exact dicts are iterated directly (unless sorting) rather than via a list of (key, value) tuples
+    int direct = PyDict_CheckExact(obj) && !buffer->prefs.sort_keys;
+
+    if (direct) {
+        len = PyDict_GET_SIZE(obj);
+
+        for (i = 0; PyDict_Next(obj, &pos, NULL, &value) && _is_leaf(value); i++);
+    } else {
+        BAIL_ON_NULL(items = PyMapping_Items(obj));
+        len = PyList_GET_SIZE(items);
 
-    // circular reference check
-    BAIL_ON_NULL(ident = PyLong_FromVoidPtr(obj));
+        for (i = 0; i < len; i++) {
+            item = PyList_GET_ITEM(items, i);
 
-    if ((seen = PySet_Contains(buffer->markers, ident))) {
-        if (-1 != seen) {
-            PyErr_SetString(PyExc_ValueError, "Circular reference detected");
+            if (!PyTuple_Check(item) || 2 != PyTuple_GET_SIZE(item) || !_is_leaf(PyTuple_GET_ITEM(item, 1))) {
+                break;
+            }
         }
 
-        goto bail;
+        item = NULL;
     }
 
-    BAIL_ON_NONZERO(PySet_Add(buffer->markers, ident));
+    // circular reference check (unless only holding leaf values)
+    if (i < len) {
+        BAIL_ON_NULL(ident = PyLong_FromVoidPtr(obj));
+
+        if ((seen = PySet_Contains(buffer->markers, ident))) {
+            if (-1 != seen) {
+                PyErr_SetString(PyExc_ValueError, "Circular reference detected");
+            }
+
+            goto bail;
+        }
 
-    BAIL_ON_NULL(items = PyMapping_Items(obj));
+        BAIL_ON_NONZERO(PySet_Add(buffer->markers, ident));
+    }
 
     if (buffer->prefs.sort_keys) {
         BAIL_ON_NONZERO(PyList_Sort(items));
@@ -1684,38 +2011,57 @@ static int _encode_PyMapping(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
 
     if (buffer->prefs.container_count) {
         WRITE_CHAR_OR_BAIL(CONTAINER_COUNT);
-        _encode_longlong(PyList_GET_SIZE(items), buffer);
+        _encode_longlong(len, buffer);
     }
 
-    BAIL_ON_NULL(iter = PyObject_GetIter(items));
+    if (direct) {
+        pos = 0;
+
+        while (PyDict_Next(obj, &pos, &key, &value)) {
+            // (encoding the value might run arbitrary code, e.g. the default function)
+            Py_INCREF(key);
+            Py_INCREF(value);
+            ret = _encode_mapping_key(key, buffer) || _bjdata_encode_value(value, buffer);
+            Py_DECREF(key);
+            Py_DECREF(value);
+            BAIL_ON_NONZERO(ret);
+        }
 
-    while (NULL != (item = PyIter_Next(iter))) {
-        if (!PyTuple_Check(item) || 2 != PyTuple_GET_SIZE(item)) {
-            PyErr_SetString(PyExc_ValueError, "items must return 2-tuples");
+        if (len != PyDict_GET_SIZE(obj)) {
+            PyErr_SetString(PyExc_RuntimeError, "dictionary changed size during iteration");
             goto bail;
         }
+    } else {
+        BAIL_ON_NULL(iter = PyObject_GetIter(items));
 
-        BAIL_ON_NONZERO(_encode_mapping_key(PyTuple_GET_ITEM(item, 0), buffer));
-        BAIL_ON_NONZERO(_bjdata_encode_value(PyTuple_GET_ITEM(item, 1), buffer));
-        Py_CLEAR(item);
-    }
+        while (NULL != (item = PyIter_Next(iter))) {
+            if (!PyTuple_Check(item) || 2 != PyTuple_GET_SIZE(item)) {
+                PyErr_SetString(PyExc_ValueError, "items must return 2-tuples");
+                goto bail;
+            }
 
-    // for PyIter_Next
-    if (PyErr_Occurred()) {
-        goto bail;
+            BAIL_ON_NONZERO(_encode_mapping_key(PyTuple_GET_ITEM(item, 0), buffer));
+            BAIL_ON_NONZERO(_bjdata_encode_value(PyTuple_GET_ITEM(item, 1), buffer));
+            Py_CLEAR(item);
+        }
+
+        // for PyIter_Next
+        if (PyErr_Occurred()) {
+            goto bail;
+        }
     }
 
     if (!buffer->prefs.container_count) {
         WRITE_CHAR_OR_BAIL(OBJECT_END);
     }
 
-    if (-1 == PySet_Discard(buffer->markers, ident)) {
+    if (NULL != ident && -1 == PySet_Discard(buffer->markers, ident)) {
         goto bail;
     }
 
-    Py_DECREF(iter);
-    Py_DECREF(items);
-    Py_DECREF(ident);
+    Py_XDECREF(iter);
+    Py_XDECREF(items);
+    Py_XDECREF(ident);
     return 0;
 
 bail:
@@ -1730,14 +2076,41 @@ bail:
 
 int _bjdata_encode_value(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
     PyObject* newobj = NULL; // result of default call (when encoding unsupported types)
+    PyTypeObject* type;
 
     if (Py_None == obj) {
         WRITE_CHAR_OR_BAIL(TYPE_NULL);
+        return 0;
     } else if (Py_True == obj) {
         WRITE_CHAR_OR_BAIL(TYPE_BOOL_TRUE);
+        return 0;
     } else if (Py_False == obj) {
         WRITE_CHAR_OR_BAIL(TYPE_BOOL_FALSE);
-    } else if (PyUnicode_Check(obj)) {
+        return 0;
+    } else if (NULL == obj) {
+        PyErr_SetString(PyExc_RuntimeError, "Internal error - _bjdata_encode_value got NULL obj");
+        goto bail;
+    }
+
+    // Fast path: exact built-in types are resolved by type pointer alone, skipping the subclass, numpy scalar and
+    // sequence/mapping protocol checks below (the latter involving an attribute lookup for every mapping).
+    type = Py_TYPE(obj);
+
+    if (&PyUnicode_Type == type) {
+        return _encode_PyUnicode(obj, buffer);
+    } else if (&PyLong_Type == type) {
+        return _encode_PyLong(obj, buffer);
+    } else if (&PyFloat_Type == type) {
+        return _encode_PyFloat(obj, buffer);
+    } else if (&PyList_Type == type || &PyTuple_Type == type) {
+        RECURSE_AND_BAIL_ON_NONZERO(_encode_PySequence(obj, buffer), " while encoding an array");
+        return 0;
+    } else if (&PyDict_Type == type) {
+        RECURSE_AND_BAIL_ON_NONZERO(_encode_PyMapping(obj, buffer), " while encoding an object");
+        return 0;
+    }
+
+    if (PyUnicode_Check(obj)) {
         BAIL_ON_NONZERO(_encode_PyUnicode(obj, buffer));
 #if PY_MAJOR_VERSION < 3
     } else if (PyInt_Check(obj) && Py_TYPE(obj) != NULL && strstr(Py_TYPE(obj)->tp_name, "numpy") == NULL) {
@@ -1753,6 +2126,8 @@ int _bjdata_encode_value(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
         BAIL_ON_NONZERO(_encode_PyBytes(obj, buffer));
     } else if (PyByteArray_Check(obj)) {
         BAIL_ON_NONZERO(_encode_PyByteArray(obj, buffer));
+    } else if (PyMemoryView_Check(obj)) {
+        BAIL_ON_NONZERO(_encode_PyMemoryView(obj, buffer));
     } else if (PyArray_CheckAnyScalar(obj)) {
         RECURSE_AND_BAIL_ON_NONZERO(_encode_NDarray(obj, buffer), " while encoding a Numpy scalar");
     } else if (PySequence_Check(obj)) {
@@ -1770,9 +2145,6 @@ int _bjdata_encode_value(PyObject* obj, _bjdata_encoder_buffer_t* buffer) {
 #endif
               ) {
         RECURSE_AND_BAIL_ON_NONZERO(_encode_PyMapping(obj, buffer), " while encoding an object");
-    } else if (NULL == obj) {
-        PyErr_SetString(PyExc_RuntimeError, "Internal error - _bjdata_encode_value got NULL obj");
-        goto bail;
     } else if (NULL != buffer->prefs.default_func) {
         BAIL_ON_NULL(newobj = PyObject_CallFunctionObjArgs(buffer->prefs.default_func, obj, NULL));
         RECURSE_AND_BAIL_ON_NONZERO(_bjdata_encode_value(newobj, buffer), " while encoding with default function");
@@ -1799,6 +2171,8 @@ int _bjdata_encoder_init(void) {
     // allow encoder to access EncoderException & Decimal class
     BAIL_ON_NULL(tmp_module = PyImport_ImportModule("bjdata.encoder"));
     BAIL_ON_NULL(EncoderException = PyObject_GetAttrString(tmp_module, "EncoderException"));
+    // conversion of lists of dicts for SOA encoding
+    BAIL_ON_NULL(RecordsToStructured = PyObject_GetAttrString(tmp_module, "__records_to_structured"));
     Py_CLEAR(tmp_module);
 
     BAIL_ON_NULL(tmp_module = PyImport_ImportModule("decimal"));
@@ -1816,6 +2190,7 @@ int _bjdata_encoder_init(void) {
 
 bail:
     Py_CLEAR(EncoderException);
+    Py_CLEAR(RecordsToStructured);
     Py_CLEAR(PyDec_Type);
     Py_XDECREF(tmp_obj);
     Py_XDECREF(tmp_module);
@@ -1825,5 +2200,6 @@ bail:
 
 void _bjdata_encoder_cleanup(void) {
     Py_CLEAR(EncoderException);
+    Py_CLEAR(RecordsToStructured);
     Py_CLEAR(PyDec_Type);
 }
\ No newline at end of file
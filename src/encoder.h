@@ -34,6 +34,7 @@ typedef struct {
     int uint8_bytes;
     int soa_format;  /* SOA encoding format for structured arrays */
     double soa_threshold;  // -1=auto, 0=force offset, 0.0-1.0=dict ratio
+    int typed_array;  /* encode homogeneous int/float sequences as typed arrays */
 } _bjdata_encoder_prefs_t;
 
 typedef struct {
@@ -55,6 +56,7 @@ typedef struct {
     int encoding;           /* SOA_STRING_FIXED/DICT/OFFSET */
     Py_ssize_t fixed_len;   /* For FIXED: max UTF-8 byte length */
     PyObject* dict_list;    /* For DICT: list of unique strings */
+    PyObject* dict_map;     /* For DICT: unique string -> index in dict_list */
     Py_ssize_t dict_count;  /* For DICT: number of unique values */
     int index_size;         /* For DICT/OFFSET: 1, 2, or 4 bytes */
     char index_marker;      /* For DICT/OFFSET: TYPE_UINT8/16/32 */
@@ -26,7 +26,7 @@ from abc import ABCMeta, abstractmethod
 from traceback import print_exc
 from types import GeneratorType
 from contextlib import contextmanager
-from time import time
+from time import perf_counter_ns
 import gc
 import cProfile
 
@@ -153,6 +153,37 @@ def profiled(name=None, no_profile=False):
         profile.print_stats("tottime")
 
 
+# Number of timed runs per library and direction, of which the fastest is reported
+RUNS = 3
+# Upper bound on the number of untimed calls made first (warming up caches)
+WARMUP_REPEATS = 100
+
+
+def timed(func, arg, repeats, name=None, no_profile=True):
+    """Returns the shortest time (in seconds) taken to call func(arg) repeats times,
+    out of RUNS runs following a warm-up. Unless no_profile is set, an additional
+    (untimed) run is profiled."""
+    for _ in range(min(WARMUP_REPEATS, repeats)):
+        func(arg)
+
+    best = None
+    for _ in range(RUNS):
+        start = perf_counter_ns()
+        for _ in range(repeats):
+            func(arg)
+        elapsed = (perf_counter_ns() - start) / 1e9
+        gc.collect()
+        if best is None or elapsed < best:
+            best = elapsed
+
+    if not no_profile:
+        with profiled(name):
+            for _ in range(repeats):
+                func(arg)
+        gc.collect()
+    return best
+
+
 def test_all_with(name, repeats=1000):
     no_profile = True
 
@@ -162,20 +193,8 @@ def test_all_with(name, repeats=1000):
 
     gc.disable()
     for lib in TEST_LIBS:
-        start = time()
-        with profiled(lib.name(), no_profile=no_profile):
-            for _ in range(repeats):
-                lib.encode(obj)
-        enc_time = time() - start
-        gc.collect()
-
-        encoded = lib.encode(obj)
-        start = time()
-        with profiled(lib.name(), no_profile=no_profile):
-            for _ in range(repeats):
-                lib.decode(encoded)
-        dec_time = time() - start
-        gc.collect()
+        enc_time = timed(lib.encode, obj, repeats, lib.name(), no_profile)
+        dec_time = timed(lib.decode, lib.encode(obj), repeats, lib.name(), no_profile)
 
         print('%s,"%s",%.3f,%.3f' % (row_start, lib.name(), enc_time, dec_time))
     gc.enable()
@@ -25,7 +25,7 @@ from unittest import TestCase, skipUnless
 from pprint import pformat
 from decimal import Decimal
 from struct import pack
-from collections import OrderedDict
+from collections import OrderedDict, UserList
 
 from bjdata import (
     dump as bjddump,
@@ -253,6 +253,13 @@ class TestEncodeDecodePlain(TestCase):  # pylint: disable=too-many-public-method
         ):
             self.check_enc_dec(value, total_size, expected_type=type_)
 
+        # beyond the default limit of int to str conversion
+        huge = 10**5000
+        encoded = self.bjddumpb(huge)
+        self.assertEqual(encoded[:4], TYPE_HIGH_PREC + TYPE_UINT16 + b"\x89\x13")
+        self.assertEqual(len(encoded), 5005)
+        self.assertTrue(self.bjdloadb(encoded) == huge)
+
         self.assertEqual(
             (
                 self.bjdloadb(
@@ -443,6 +450,14 @@ class TestEncodeDecodePlain(TestCase):  # pylint: disable=too-many-public-method
             # self.assertEqual((self.bjdloadb(self.bjddumpb(cast(b'\x04' * 4)), no_bytes=True) == ndarray([4] * 4, npint8)).all(), True)
             self.check_enc_dec(cast(b"largebinary" * 100))
 
+    def test_memoryview(self):
+        for raw in (b"", b"\x01" * 4, b"largebinary" * 100):
+            self.assertEqual(self.bjddumpb(memoryview(raw)), self.bjddumpb(raw))
+        # multi-byte & non-contiguous views are written as their raw bytes
+        data = np.arange(12, dtype="<i2").reshape(3, 4)
+        for view in (memoryview(data), memoryview(data[:, ::2])):
+            self.assertEqual(self.bjdloadb(self.bjddumpb(view)), view.tobytes())
+
     def test_nd_array(self):
         raw_start = (
             ARRAY_START
@@ -593,6 +608,34 @@ class TestEncodeDecodePlain(TestCase):  # pylint: disable=too-many-public-method
             True,
         )
 
+    def test_nd_array_layout(self):
+        data = np.arange(12, dtype=np.int32).reshape(3, 4)
+        # non-contiguous views and column-major arrays are written row-major
+        for view in (data.T, data[:, ::2], np.asfortranarray(data)):
+            self.assertEqual(
+                self.bjddumpb(view), self.bjddumpb(np.ascontiguousarray(view))
+            )
+            self.assertTrue((self.bjdloadb(self.bjddumpb(view)) == view).all())
+        # payloads are written in native byte order (as read by the decoder),
+        # regardless of the array's own or islittle
+        for value in (data, data.astype(">i4"), data.astype("<i4")):
+            for islittle in (True, False):
+                encoded = self.bjddumpb(value, islittle=islittle)
+                self.assertEqual(encoded[-4:], data[-1:, -1].tobytes())
+                decoded = self.bjdloadb(encoded, islittle=islittle)
+                self.assertEqual(decoded.shape, data.shape)
+                self.assertTrue((decoded == data).all())
+        # zero-dimensional arrays keep their (empty) shape
+        for islittle in (True, False):
+            self.assertEqual(
+                self.bjddumpb(np.array(5, dtype=">i4"), islittle=islittle),
+                self.bjddumpb(np.array(5, dtype="<i4"), islittle=islittle),
+            )
+        self.assertEqual(self.bjddumpb(np.int16(3)), TYPE_INT16 + b"\x03\x00")
+        self.assertEqual(
+            self.bjddumpb(np.int16(3), islittle=False), TYPE_INT16 + b"\x00\x03"
+        )
+
     def test_array_fixed(self):
         raw_start = (
             ARRAY_START + CONTAINER_TYPE + TYPE_INT8 + CONTAINER_COUNT + TYPE_UINT8
@@ -666,6 +709,75 @@ class TestEncodeDecodePlain(TestCase):  # pylint: disable=too-many-public-method
             [[], [True], [False, True]],
         )
 
+    def test_typed_array(self):
+        raw_start = ARRAY_START + CONTAINER_TYPE
+        self.assertEqual(
+            self.bjddumpb(list(range(16)), typed_array=True),
+            raw_start + TYPE_UINT8 + CONTAINER_COUNT + TYPE_UINT8 + b"\x10"
+            # values
+            + bytes(bytearray(range(16))),
+        )
+        self.assertEqual(
+            self.bjddumpb([-1.5] * 16, typed_array=True),
+            raw_start
+            + TYPE_FLOAT64
+            + CONTAINER_COUNT
+            + TYPE_UINT8
+            + b"\x10"
+            + pack("=d", -1.5) * 16,
+        )
+
+        # payloads are written in native byte order (as read by the decoder),
+        # regardless of islittle
+        for obj, dtype in ((list(range(300, 320)), "u2"), ([-1.5] * 16, "f8")):
+            for islittle in (True, False):
+                encoded = self.bjddumpb(obj, typed_array=True, islittle=islittle)
+                self.assertTrue(encoded.endswith(np.array(obj, dtype=dtype).tobytes()))
+                self.assertEqual(
+                    self.bjdloadb(encoded, islittle=islittle).tolist(), obj
+                )
+
+        # short, mixed or non-numeric sequences and sequences other than lists &
+        # tuples are encoded element by element
+        for obj in (
+            range(30),
+            UserList(range(30)),
+            list(range(15)),
+            list(range(16)) + [1.5],
+            [1] * 16 + [True],
+            [True] * 16,
+            ["a"] * 16,
+            [2**64] * 16,
+            [-(2**63) - 1] * 16,
+        ):
+            self.assertEqual(self.bjddumpb(obj, typed_array=True), self.bjddumpb(obj))
+
+        # narrowest type covering the value range (for short & long sequences)
+        for repeat in (8, 100):
+            for obj, dtype in (
+                ([0, 255] * repeat, "u1"),
+                ([-128, 127] * repeat, "i1"),
+                ([0, 2**16 - 1] * repeat, "u2"),
+                ([-(2**15), 2**15 - 1] * repeat, "i2"),
+                ([0, 2**32 - 1] * repeat, "u4"),
+                ([-(2**31), 2**31 - 1] * repeat, "i4"),
+                ([0, 2**64 - 1] * repeat, "u8"),
+                ([-(2**63), 2**63 - 1] * repeat, "i8"),
+                ((0.25, -1e300) * repeat, "f8"),
+            ):
+                decoded = self.bjdloadb(self.bjddumpb(obj, typed_array=True))
+                self.assertEqual(decoded.dtype, np.dtype(dtype))
+                self.assertEqual(decoded.tolist(), list(obj))
+        obj = [-1, 2**63] * 100
+        self.assertEqual(self.bjddumpb(obj, typed_array=True), self.bjddumpb(obj))
+
+        # nested
+        obj = {"a": list(range(100)), "b": [[0.5] * 20, 1]}
+        decoded = self.bjdloadb(self.bjddumpb(obj, typed_array=True))
+        self.assertEqual(decoded["a"].tolist(), obj["a"])
+        self.assertEqual(decoded["b"][0].tolist(), obj["b"][0])
+        self.assertEqual(decoded["b"][1], 1)
+
     def test_array_noop(self):
         # only supported without type
         self.assertEqual(
@@ -925,10 +1037,18 @@ class TestEncodeDecodePlain(TestCase):  # pylint: disable=too-many-public-method
         sequence.append(sequence)
         mapping = {"a": 1, "b": 2}
         mapping["c"] = mapping
+        # indirect, via containers which otherwise only hold scalars
+        indirect = {"a": 1}
+        indirect["b"] = [1, (2, indirect)]
 
-        for container in (sequence, mapping):
+        for container in (sequence, mapping, indirect):
             with self.assertRaises(ValueError):
                 self.bjddumpb(container)
+        # also when lists of dicts are candidates for SOA encoding
+        records = [mapping, {"a": 3, "b": 4, "c": mapping}]
+        for container in ([mapping], records):
+            with self.assertRaises(ValueError):
+                self.bjddumpb(container, soa_format="col")
 
         # Refering to the same container multiple times is valid however
         sequence = [1, 2, 3]
@@ -939,6 +1059,30 @@ class TestEncodeDecodePlain(TestCase):  # pylint: disable=too-many-public-method
         with self.assertRaises(EncoderException):
             self.bjddumpb(type(None))
 
+    def test_container_subclasses(self):
+        class Text(str):
+            pass
+
+        # twice, since how to encode a type is only determined once
+        for _ in range(2):
+            self.assertEqual(self.bjddumpb(Text("ab")), self.bjddumpb("ab"))
+            self.assertEqual(
+                self.bjddumpb(OrderedDict(a=[1])), self.bjddumpb({"a": [1]})
+            )
+            self.assertEqual(
+                self.bjddumpb(UserList([1, (2,)])), self.bjddumpb([1, [2]])
+            )
+
+    def test_mapping_changed_while_encoding(self):
+        obj = {"a": type(None), "b": 1}
+
+        def default(value):
+            del obj["b"]
+            return None
+
+        with self.assertRaises(RuntimeError):
+            self.bjddumpb(obj, default=default)
+
     def test_decoder_fuzz(self):
         for start, end, fmt in (
             (0, pow(2, 8), ">B"),
@@ -1313,6 +1457,72 @@ class TestEncodeDecodePlain(TestCase):  # pylint: disable=too-many-public-method
         self.assertTrue(np.array_equal(result["x"], data["x"]))
         self.assertTrue(np.array_equal(result["y"], data["y"]))
 
+    def test_soa_list_of_dicts(self):
+        """Test SOA with list of dicts"""
+        data = [
+            {
+                "id": i,
+                "value": i / 4,
+                "name": ("a", "bb", "ccc")[i % 3],
+                "flag": i % 2 == 0,
+                "pos": {"x": -i, "y": 2 * i},
+            }
+            for i in range(10)
+        ]
+
+        for soa_format in ("col", "row"):
+            result = self.bjdloadb(self.bjddumpb(data, soa_format=soa_format))
+
+            self.assertIsInstance(result, np.ndarray)
+            self.assertEqual(result.dtype.names, ("id", "value", "name", "flag", "pos"))
+            self.assertEqual(result["id"].dtype, np.uint8)
+            self.assertEqual(result["pos"]["x"].dtype, np.int8)
+            for i, record in enumerate(data):
+                self.assertEqual(result[i]["id"], record["id"])
+                self.assertEqual(result[i]["value"], record["value"])
+                self.assertEqual(result[i]["name"], record["name"])
+                self.assertEqual(result[i]["flag"], record["flag"])
+                self.assertEqual(result[i]["pos"]["x"], record["pos"]["x"])
+                self.assertEqual(result[i]["pos"]["y"], record["pos"]["y"])
+
+        # dictionary-encoded strings are listed in order of first occurrence
+        values = ["b" * 20, "a" * 25, "c" * 14]
+        encoded = self.bjddumpb(
+            [{"s": value} for value in values * 30], soa_format="col"
+        )
+        self.assertIn(
+            ARRAY_START
+            + CONTAINER_TYPE
+            + TYPE_STRING
+            + CONTAINER_COUNT
+            + TYPE_UINT8
+            + b"\x03"
+            + b"".join(
+                TYPE_UINT8 + bytes([len(value)]) + value.encode() for value in values
+            )
+            + OBJECT_END,
+            encoded,
+        )
+
+        # lists not representable as structured array are encoded as usual
+        for data in (
+            [{"a": 1}, {"b": 1}],
+            [{"a": 1}, {"a": None}],
+            [{"a": 1}, {"a": "x"}],
+            [{"a": 2**64}],
+            [{"a": 2**60}, {"a": 0.5}],
+            [{"a": "x\0"}],
+            [{"": 1}],
+            [{"a": 1}, 1],
+            [{}, {}],
+            [{"a": {}}],
+            [{"a": 1, "b": {}}],
+        ):
+            for soa_format in ("col", "row"):
+                self.assertEqual(
+                    self.bjddumpb(data, soa_format=soa_format), self.bjddumpb(data)
+                )
+
     def test_soa_single_element(self):
         """Test SOA with single element"""
         dt = np.dtype([("x", "u1"), ("y", "u1")])
@@ -1400,6 +1610,21 @@ class TestEncodeDecodePlain(TestCase):  # pylint: disable=too-many-public-method
         self.assertEqual(result.shape, data.shape)
         self.assertTrue(np.array_equal(result, data))
 
+    def test_soa_roundtrip_non_contiguous(self):
+        """Test SOA roundtrip of structured array views"""
+        dt = np.dtype([("x", "u1"), ("y", "<i4"), ("z", "?")])
+        data = np.zeros((3, 4), dtype=dt)
+        data["x"] = np.arange(12).reshape(3, 4)
+        data["y"] = -data["x"]
+        data["z"] = data["x"] % 3 == 0
+
+        for view in (data.T, data[:, ::2], data[::-1], data[1]):
+            for soa_format in ("col", "row"):
+                result = self.bjdloadb(self.bjddumpb(view, soa_format=soa_format))
+
+                self.assertEqual(result.shape, view.shape)
+                self.assertTrue(np.array_equal(result, view))
+
     def test_soa_binary_format_col_major(self):
         """Test that column-major SOA produces expected binary format"""
         dt = np.dtype([("x", "u1"), ("y", "u1")])